@@ -0,0 +1,93 @@
+import hmac
+import os
+from functools import wraps
+from flask import Blueprint, request, jsonify
+from roster import parse_roster, import_roster, InvalidRoster
+
+# Create a Blueprint for admin routes
+admin_routes = Blueprint("admin_routes", __name__)
+
+ADMIN_KEY_HEADER = "X-Admin-Key"
+
+
+def admin_key_required(fn):
+    """Allow the request only if it carries the ADMIN_API_KEY; disabled when unset."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        expected = os.getenv("ADMIN_API_KEY")
+        supplied = request.headers.get(ADMIN_KEY_HEADER, "")
+        if not expected or not hmac.compare_digest(supplied, expected):
+            return jsonify({"error": "Admin key required"}), 403
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+@admin_routes.route("/api/admin/roster", methods=["POST"])
+@admin_key_required
+def import_roster_upload():
+    """
+    Bulk-import a crew roster, creating missing teams.
+    ---
+    tags:
+      - Admin
+    parameters:
+      - name: X-Admin-Key
+        in: header
+        required: true
+        type: string
+        description: Value of the ADMIN_API_KEY environment variable
+    requestBody:
+      content:
+        application/json:
+          schema:
+            type: array
+            items:
+              type: object
+              properties:
+                email:
+                  type: string
+                username:
+                  type: string
+                password:
+                  type: string
+                team_name:
+                  type: string
+        text/csv:
+          schema:
+            type: string
+            description: "CSV with a header row: email,username,password,team_name"
+    responses:
+      200:
+        description: Import summary
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                created:
+                  type: integer
+                  description: Number of users created
+                skipped:
+                  type: integer
+                  description: Number of users whose email or username already existed
+                teams:
+                  type: integer
+                  description: Number of teams referenced by the roster
+                errors:
+                  type: array
+                  description: Rows rejected as invalid
+      400:
+        description: Unparseable roster
+      403:
+        description: Missing or wrong admin key
+      500:
+        description: Server error
+    """
+    fmt = "csv" if request.mimetype == "text/csv" else "json"
+    try:
+        rows = parse_roster(request.get_data(as_text=True), fmt)
+        return jsonify(import_roster(rows)), 200
+    except InvalidRoster as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
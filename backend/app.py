@@ -1,22 +1,32 @@
-from flask import Flask, request, jsonify
+import click
+from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_jwt_extended import (
     JWTManager,
     create_access_token,
     jwt_required,
-    get_jwt_identity,
 )
 from datetime import timedelta
-from models import db, User, Teams
+from models import db, User, UserPoints
 from dotenv import load_dotenv
 import os
 import sys
 from sqlalchemy import text
-from flasgger import Swagger
 from task_routes import task_routes
 from team_routes import team_routes
 from user_routes import user_routes
+from dashboard_routes import dashboard_routes
+from admin_routes import admin_routes
+from event_routes import event_routes
+from iss_routes import iss_routes
+from geocode_routes import geocode_routes
+from scores import rebuild_team_points, rebuild_user_points
+from pagination import NEXT_CURSOR_HEADER
+from identity import current_identity, identity_claims
+from passwords import password_hasher, PasswordHasherBusy
+from roster import ensure_teams, parse_roster, import_roster
+from metrics import init_metrics
+from photos import PhotoPipeline, default_store, PHOTO_STORE, PHOTO_LOCAL_ROOT, PHOTO_PROCESSES
 
 # Load environment variables
 load_dotenv()
@@ -25,7 +35,8 @@ def create_app():
     app = Flask(__name__)
     
     # Configure CORS
-    CORS(app, resources={r"/*": {"origins": "*"}}, allow_headers=["Content-Type", "Authorization"])
+    CORS(app, resources={r"/*": {"origins": "*"}}, allow_headers=["Content-Type", "Authorization"],
+         expose_headers=[NEXT_CURSOR_HEADER, "X-Track-Start", "X-Track-End"])
 
     
     # Database Configuration for PostgreSQL
@@ -61,19 +72,70 @@ def create_app():
     # Initialize extensions
     jwt = JWTManager(app)
     db.init_app(app)
+    init_metrics(app)
 
     app.register_blueprint(task_routes)  # Register the task routes
     app.register_blueprint(team_routes)
     app.register_blueprint(user_routes)
-    app.config['SWAGGER'] = {
-        'title': 'Astronaut Task API',
-        'uiversion': 3,
-        'openapi': '3.0.2'
-    }
+    app.register_blueprint(dashboard_routes)
+    app.register_blueprint(admin_routes)
+    app.register_blueprint(event_routes)
+    app.register_blueprint(iss_routes)
+    app.register_blueprint(geocode_routes)
 
-    
+    @app.cli.command("rebuild-team-points")
+    def rebuild_team_points_command():
+        """Recompute the materialized team totals from UserTasks."""
+        count = rebuild_team_points()
+        print(f"Rebuilt points for {count} teams.")
+
+    @app.cli.command("rebuild-user-points")
+    def rebuild_user_points_command():
+        """Recompute the materialized per-user totals from UserTasks."""
+        count = rebuild_user_points()
+        print(f"Rebuilt points for {count} users.")
+
+    @app.cli.command("import-roster")
+    @click.argument("path")
+    @click.option("--format", "fmt", type=click.Choice(["csv", "json"]), default=None,
+                  help="Defaults to the file extension")
+    def import_roster_command(path, fmt):
+        """Bulk-create teams and users from a CSV or JSON roster file."""
+        fmt = fmt or path.rsplit(".", 1)[-1].lower()
+        with open(path, encoding="utf-8") as f:
+            summary = import_roster(parse_roster(f.read(), fmt))
+        print(f"Created {summary['created']} users, skipped {summary['skipped']} existing, "
+              f"{len(summary['errors'])} invalid rows, across {summary['teams']} teams.")
+        for error in summary["errors"]:
+            print(f"  row {error['index']}: {error['error']}")
 
-    swagger = Swagger(app)  
+    @app.cli.command("process-photos")
+    @click.option("--once", is_flag=True, help="Process the current backlog and exit")
+    @click.option("--processes", type=int, default=PHOTO_PROCESSES, show_default=True)
+    def process_photos_command(once, processes):
+        """Render thumbnail and WebP variants of completion photos."""
+        pipeline = PhotoPipeline(default_store(), processes)
+        try:
+            pipeline.run(app, follow=not once)
+        finally:
+            pipeline.close()
+
+    if PHOTO_STORE == "local":
+        # Offline runs keep variants on disk instead of in the bucket
+        @app.route("/photos/<path:key>")
+        def local_photo(key):
+            return send_from_directory(os.path.abspath(PHOTO_LOCAL_ROOT), key, max_age=31536000)
+
+    # Swagger docs are optional so production workers can skip flasgger entirely
+    if os.getenv("SWAGGER_ENABLED", "true").lower() in ("1", "true", "yes"):
+        from flasgger import Swagger
+
+        app.config['SWAGGER'] = {
+            'title': 'Astronaut Task API',
+            'uiversion': 3,
+            'openapi': '3.0.2'
+        }
+        Swagger(app)
     
     return app
 
@@ -111,6 +173,8 @@ def register():
         description: User registered successfully
       400:
         description: Invalid input or user already exists
+      503:
+        description: Password hashing pool saturated, retry shortly
       500:
         description: Server error
     """
@@ -131,24 +195,23 @@ def register():
 
     try:
         # Hash the password
-        hashed_password = generate_password_hash(password)
+        hashed_password = password_hasher.hash(password)
         
-        # Check if the team already exists
-        team = Teams.query.filter_by(team_name=team_name).first()
-        
-        # If the team doesn't exist, create a new team
-        if not team:
-            team = Teams(team_name=team_name, join_id="TEAM" + str(Teams.query.count() + 1))
-            db.session.add(team)
-            db.session.flush()  # Ensures team_id is available for new_user assignment
+        # Find the team, creating it (with a sequence-backed join_id) if it doesn't exist
+        team_id = ensure_teams([team_name])[team_name]
         
         # Create the new user and assign to the team
-        new_user = User(email=email, username=username, password=hashed_password, team_id=team.team_id)
+        new_user = User(email=email, username=username, password=hashed_password, team_id=team_id)
         db.session.add(new_user)
+        db.session.flush()
+        db.session.add(UserPoints(user_id=new_user.user_id, total_points=0))
         db.session.commit()
         
         return jsonify({"message": "User registered successfully", "team": team_name}), 201
     
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
@@ -181,6 +244,8 @@ def login():
         description: Missing email or password
       401:
         description: Invalid email or password
+      503:
+        description: Password hashing pool saturated, retry shortly
       500:
         description: Server error
     """
@@ -192,17 +257,25 @@ def login():
         return jsonify({"error": "Email and password are required"}), 400
         
     user = User.query.filter_by(email=email).first()
-    if not user or not check_password_hash(user.password, password):
-        return jsonify({"error": "Invalid email or password"}), 401
+    try:
+        if not user or not password_hasher.verify(user.password, password):
+            return jsonify({"error": "Invalid email or password"}), 401
+
+        # Upgrade hashes made with an older algorithm or cost while we have the password
+        if password_hasher.needs_rehash(user.password):
+            user.password = password_hasher.hash(password)
+            db.session.commit()
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
         
-    access_token = create_access_token(identity=email)
+    access_token = create_access_token(identity=email, additional_claims=identity_claims(user))
     return jsonify({"access_token": access_token, "email": email})
 
 @app.route("/api/protected", methods=["GET"])
 @jwt_required()
 def protected():
-    current_user = get_jwt_identity()
-    user = User.query.filter_by(email=current_user).first()
+    user = current_identity()
     if not user:
         return jsonify({"error": "User not found"}), 404
     return jsonify({
@@ -210,12 +283,6 @@ def protected():
         "user_since": user.created_at.strftime("%Y-%m-%d %H:%M:%S"),
     })
 
-@app.route("/api/users", methods=["GET"])
-@jwt_required()
-def get_users():
-    users = User.query.all()
-    return jsonify({"users": [user.to_dict() for user in users]})
-
 
 
 
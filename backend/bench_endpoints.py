@@ -0,0 +1,342 @@
+"""
+Benchmark every route of the API against a seeded local database.
+
+Drives the registered routes either through Flask's test client or through a
+real WSGI server on localhost, and reports per endpoint: p50/p95/p99
+latency, throughput and SQL statements per request. POST routes get
+generated bodies and really write (completions, registrations, roster
+imports), so point the app at a scratch database. The ISS position and
+reverse-geocode upstreams are replaced by a stub server on localhost.
+Routes in EXCLUDED are skipped, with the reason printed at startup.
+
+    python gen_data.py --users 100000 --completions 1000000   # seed first
+    python bench_endpoints.py --requests 200 --out run.json
+    python bench_endpoints.py --mode wsgi --concurrency 8 --compare run.json --threshold 0.2
+
+With --compare the run is checked against an earlier JSON result and the
+script exits non-zero if any endpoint's p95 grew by more than --threshold.
+"""
+import argparse
+import itertools
+import json
+import os
+import re
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from sqlalchemy import event
+
+# Endpoint (or blueprint prefix) -> why it is not benchmarked
+EXCLUDED = {
+    "event_routes.get_events": "server-sent event stream; stays open, so latency is not meaningful",
+    "flasgger": "Swagger UI and spec, not part of the API",
+    "static": "static files",
+    "local_photo": "file serving for PHOTO_STORE=local only",
+}
+BATCH_SIZE = 10
+# Unique suffixes for bodies that must not collide (emails, idempotency keys)
+RUN_ID = uuid.uuid4().hex[:8]
+_sequence = itertools.count()
+
+
+def _unique():
+    return f"{RUN_ID}-{next(_sequence)}"
+
+
+def _completion_body(values):
+    return {"file_key": f"bench/{_unique()}.jpg"}
+
+
+def _batch_body(values):
+    return {"completions": [
+        {"task_id": values["task_id"], "file_key": f"bench/{_unique()}.jpg", "idempotency_key": _unique()}
+        for _ in range(BATCH_SIZE)
+    ]}
+
+
+def _register_body(values):
+    name = f"bench{_unique()}"
+    return {"email": f"{name}@bench.test", "username": name, "password": "bench-password",
+            "team_name": values["team_name"]}
+
+
+def _roster_body(values):
+    name = f"roster{_unique()}"
+    return [{"email": f"{name}@bench.test", "username": name, "password": "bench-password",
+             "team_name": values["team_name"]}]
+
+
+# Endpoint -> (query string, body factory or None) for routes that need more than a bare GET
+REQUESTS = {
+    "task_routes.complete_task": ("", _completion_body),
+    "task_routes.complete_tasks_batch": ("", _batch_body),
+    "task_routes.generate_presigned_url": ("", lambda values: {"file_name": "photo.jpg"}),
+    "task_routes.generate_presigned_urls": ("", lambda values: {
+        "file_names": [f"photo_{i}.jpg" for i in range(BATCH_SIZE)]
+    }),
+    "register": ("", _register_body),
+    "login": ("", lambda values: {"email": values["email"], "password": values["password"]}),
+    "admin_routes.import_roster_upload": ("", _roster_body),
+    "iss_routes.get_iss_passes": ("?lat=51.5&lng=-0.1&days=3", None),
+    "geocode_routes.reverse_geocode": ("?lat=48.85&lng=2.35", None),
+    "user_routes.get_user_leaderboard": ("?around_me=5", None),
+}
+
+
+class _StubUpstream(BaseHTTPRequestHandler):
+    """Answers the ISS position and Nominatim reverse formats with fixed data."""
+
+    def do_GET(self):
+        if self.path.startswith("/iss-now.json"):
+            body = {"timestamp": int(time.time()), "iss_position": {"latitude": "12.3", "longitude": "45.6"}}
+        else:
+            body = {"address": {"city": "Paris", "state": "Ile-de-France", "country": "France"}}
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def stub_upstreams():
+    """Point the ISS position cache and the geocoder at a local stub server."""
+    import geocode
+    import iss
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubUpstream)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    iss.iss_position.fetch = iss.OpenNotifySource(f"{base}/iss-now.json")
+    iss.iss_position.invalidate()
+    geocode._geocoder = geocode.ReverseGeocoder(geocode.NominatimSource(f"{base}/reverse"), min_interval=0)
+    return server
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class QueryCounter:
+    """Counts SQL statements per thread via SQLAlchemy engine events."""
+
+    def __init__(self, engine):
+        self._local = threading.local()
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args, **kwargs):
+        self._local.count = getattr(self._local, "count", 0) + 1
+
+    def reset(self):
+        self._local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self._local, "count", 0)
+
+
+def sample_values(app, password):
+    """Pick real ids from the database for the routes' path parameters and bodies."""
+    from models import db, User, Tasks, Teams
+
+    with app.app_context():
+        user = User.query.order_by(User.user_id).first()
+        task = Tasks.query.order_by(Tasks.task_id).first()
+        if user is None or task is None:
+            raise SystemExit("Database has no users or tasks; seed it with initdb.py / gen_data.py first")
+        team = db.session.get(Teams, user.team_id) if user.team_id else Teams.query.first()
+        return user, {
+            "user_id": user.user_id,
+            "team_id": user.team_id or 1,
+            "team_name": team.team_name if team else "Bench Team",
+            "task_id": task.task_id,
+            "email": user.email,
+            "password": password,
+            "n": 5,
+        }
+
+
+def routes(app, values):
+    """(endpoint, method, path, query, body factory) for every benchmarked route."""
+    found = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint in EXCLUDED or rule.endpoint.split(".", 1)[0] in EXCLUDED:
+            continue
+        method = "POST" if "POST" in rule.methods else "GET"
+        path = re.sub(r"<(?:[^:>]+:)?([^>]+)>", lambda m: str(values[m.group(1)]), rule.rule)
+        query, body = REQUESTS.get(rule.endpoint, ("", None))
+        found.append((rule.endpoint, method, path, query, body))
+    return sorted(found)
+
+
+def auth_header(app, user):
+    from flask_jwt_extended import create_access_token
+    from identity import identity_claims
+
+    with app.app_context():
+        token = create_access_token(identity=user.email, additional_claims=identity_claims(user))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_client_caller(app, headers, counter):
+    client = app.test_client()
+
+    def call(method, path, body):
+        counter.reset()
+        start = time.perf_counter()
+        response = client.open(path, method=method, headers=headers, json=body)
+        elapsed = time.perf_counter() - start
+        return response.status_code, elapsed, counter.count
+    return call
+
+
+def wsgi_caller(app, headers, counter):
+    from werkzeug.serving import make_server
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    # The server handles each request on its own thread, so count per request there
+    @app.before_request
+    def _reset_queries():
+        counter.reset()
+
+    @app.after_request
+    def _report_queries(response):
+        response.headers["X-Bench-Queries"] = str(counter.count)
+        return response
+
+    def call(method, path, body):
+        data = None if body is None else json.dumps(body).encode()
+        req = urllib.request.Request(
+            base + path, data=data, method=method,
+            headers={**headers, "Content-Type": "application/json"} if data is not None else headers,
+        )
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req) as response:
+                response.read()
+                status, queries = response.status, int(response.headers.get("X-Bench-Queries", 0))
+        except urllib.error.HTTPError as e:
+            status, queries = e.code, int(e.headers.get("X-Bench-Queries", 0))
+        return status, time.perf_counter() - start, queries
+    call.server = server
+    return call
+
+
+def bench_route(call, method, path, body, values, requests, concurrency, warmup):
+    # A fresh body per request, so writes do not collide on unique columns
+    def one(_):
+        return call(method, path, body(values) if body else None)
+
+    for _ in range(warmup):
+        one(None)
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(one, range(requests)))
+    else:
+        samples = [one(None) for _ in range(requests)]
+    wall = time.perf_counter() - started
+
+    latencies = sorted(elapsed * 1000 for _, elapsed, _ in samples)
+    statuses = sorted({status for status, _, _ in samples})
+    return {
+        "method": method,
+        "path": path,
+        "requests": requests,
+        "statuses": statuses,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "mean_ms": statistics.fmean(latencies),
+        "throughput_rps": requests / wall,
+        "queries_per_request": statistics.fmean(queries for _, _, queries in samples),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return a list of (endpoint, old p95, new p95) that regressed beyond ``threshold``."""
+    regressions = []
+    old = baseline.get("endpoints", {})
+    for endpoint, result in results["endpoints"].items():
+        if endpoint not in old:
+            continue
+        before, after = old[endpoint]["p95_ms"], result["p95_ms"]
+        if before > 0 and (after - before) / before > threshold:
+            regressions.append((endpoint, before, after))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["client", "wsgi"], default="client")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--only", help="regex; benchmark only endpoints whose path matches")
+    parser.add_argument("--password", default="synthetic-password",
+                        help="password of the first seeded user, for /api/login (gen_data.py's default)")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="earlier JSON result to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative p95 slowdown")
+    args = parser.parse_args()
+
+    # The roster route checks the key on every request
+    os.environ.setdefault("ADMIN_API_KEY", "bench-admin-key")
+    from app import app
+    from models import db
+
+    with app.app_context():
+        counter = QueryCounter(db.engine)
+    user, values = sample_values(app, args.password)
+    headers = {**auth_header(app, user), "X-Admin-Key": os.environ["ADMIN_API_KEY"]}
+    upstream = stub_upstreams()
+    caller = (wsgi_caller if args.mode == "wsgi" else test_client_caller)(app, headers, counter)
+
+    for endpoint, reason in EXCLUDED.items():
+        print(f"skipping {endpoint}: {reason}")
+    results = {"mode": args.mode, "concurrency": args.concurrency, "created_at": time.time(), "endpoints": {}}
+    print(f"{'endpoint':<53} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>9} {'queries':>8}")
+    for endpoint, method, path, query, body in routes(app, values):
+        if args.only and not re.search(args.only, path):
+            continue
+        result = bench_route(caller, method, path + query, body, values, args.requests, args.concurrency, args.warmup)
+        results["endpoints"][endpoint] = result
+        print(f"{method + ' ' + path:<53} {result['p50_ms']:8.2f} {result['p95_ms']:8.2f} {result['p99_ms']:8.2f} "
+              f"{result['throughput_rps']:9.1f} {result['queries_per_request']:8.1f}")
+
+    if hasattr(caller, "server"):
+        caller.server.shutdown()
+    upstream.shutdown()
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for endpoint, before, after in regressions:
+            print(f"REGRESSION {endpoint}: p95 {before:.2f} ms -> {after:.2f} ms")
+        if regressions:
+            sys.exit(1)
+        print(f"No endpoint slowed down by more than {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
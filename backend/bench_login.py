@@ -0,0 +1,54 @@
+"""
+Benchmark password verification throughput, i.e. the CPU cost of a login.
+
+Runs check_password_hash through PasswordHasher at increasing pool sizes and
+reports logins/second overall and per worker, for the configured method and
+any extra methods given on the command line.
+
+    python bench_login.py [--seconds 3] [--executor thread|process] [METHOD ...]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash
+from passwords import PasswordHasher, PASSWORD_HASH_METHOD
+
+PASSWORD = "correct horse battery staple"
+
+
+def throughput(method, executor, workers, seconds):
+    hasher = PasswordHasher(method=method, executor=executor, workers=workers, queue=workers * 4)
+    stored = generate_password_hash(PASSWORD, method)
+    hasher.verify(stored, PASSWORD)  # warm the pool
+
+    done = 0
+    deadline = time.perf_counter() + seconds
+    # Enough client threads to keep every hashing worker busy
+    with ThreadPoolExecutor(max_workers=workers * 2) as clients:
+        start = time.perf_counter()
+        while time.perf_counter() < deadline:
+            futures = [clients.submit(hasher.verify, stored, PASSWORD) for _ in range(workers * 2)]
+            done += sum(1 for future in futures if future.result())
+        elapsed = time.perf_counter() - start
+    return done / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("methods", nargs="*", default=[PASSWORD_HASH_METHOD])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    sizes = sorted({1, max(1, cores // 2), cores})
+    for method in args.methods:
+        print(f"{method} ({args.executor} pool, {cores} cores)")
+        for workers in sizes:
+            rate = throughput(method, args.executor, workers, args.seconds)
+            print(f"  {workers:>3} workers: {rate:8.1f} logins/s, {rate / workers:7.1f} per worker")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Benchmark ISS pass prediction for many ground locations at once.
+
+Propagates the orbit from the local TLE file and predicts passes for random
+locations, reporting the batch time and the cost per location. Pass --max-ms
+to fail when the largest batch is slower than a budget.
+
+    python bench_passes.py [--locations 10 100 500] [--days 7] [--max-ms 100]
+"""
+import argparse
+import random
+import sys
+import time
+from orbit import tle_store, predict_passes, _sample_orbit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--locations", type=int, nargs="+", default=[1, 10, 100, 500])
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, help="fail if the largest batch takes longer")
+    args = parser.parse_args()
+
+    tle = tle_store.current()
+    start = time.time()
+    rng = random.Random(42)
+    print(f"TLE {tle.name}, {args.days} days, best of {args.repeat}")
+    print(f"{'locations':>10} {'batch ms':>10} {'us/location':>12} {'passes':>8}")
+    best = 0.0
+    for count in args.locations:
+        lats = [rng.uniform(-60, 60) for _ in range(count)]
+        lngs = [rng.uniform(-180, 180) for _ in range(count)]
+        timings = []
+        for _ in range(args.repeat):
+            # Include propagation, as a fresh TLE or window would
+            _sample_orbit.cache_clear()
+            started = time.perf_counter()
+            passes = predict_passes(tle, lats, lngs, start, args.days)
+            timings.append(time.perf_counter() - started)
+        best = min(timings) * 1000
+        print(f"{count:>10} {best:>10.2f} {best * 1000 / count:>12.1f} {sum(map(len, passes)):>8}")
+
+    if args.max_ms is not None and best > args.max_ms:
+        print(f"Largest batch took {best:.2f} ms, over the {args.max_ms} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark the photo variant pipeline offline.
+
+Renders synthetic camera-sized JPEGs into thumbnail and WebP variants,
+reading and writing a temporary directory or, with --s3, moto's in-process
+S3. Reports throughput for each process count and the bytes a feed entry
+costs with the original versus the thumbnail.
+
+    python bench_photos.py [--photos 32] [--processes 1 4] [--size 4000 3000] [--s3]
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+from photos import PhotoPipeline, LocalStore, S3Store, PHOTO_VARIANTS, variant_key
+
+BUCKET = "bench-photos"
+
+
+def make_photo(width, height, seed):
+    from PIL import Image
+
+    # Fractal detail compresses like a real photo, unlike a flat colour
+    image = Image.effect_mandelbrot((width, height), (-2 + seed * 0.01, -1.2, 1, 1.2), 100)
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def make_store(use_s3, directory):
+    if not use_s3:
+        return LocalStore(directory, "http://localhost:5000/photos"), None
+
+    import boto3
+    from moto import mock_aws
+
+    mock = mock_aws()
+    mock.start()
+    client = boto3.client("s3", region_name="us-east-1")
+    client.create_bucket(Bucket=BUCKET)
+    return S3Store(client, BUCKET), mock
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos", type=int, default=32)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--size", type=int, nargs=2, default=[4000, 3000], metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--s3", action="store_true", help="use moto's in-process S3 instead of a directory")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store, mock = make_store(args.s3, directory)
+        try:
+            originals = {}
+            for i in range(args.photos):
+                key = f"bench{i}_photo.jpg"
+                store.put(key, make_photo(*args.size, i), "image/jpeg")
+                originals[i] = store.url(key)
+
+            print(f"{args.photos} photos of {args.size[0]}x{args.size[1]}, {'moto S3' if args.s3 else 'local files'}")
+            print(f"{'processes':>10} {'seconds':>9} {'photos/s':>9}")
+            for processes in args.processes:
+                pipeline = PhotoPipeline(store, processes)
+                pipeline.process({0: originals[0]})  # start the pool outside the timing
+                start = time.perf_counter()
+                results = pipeline.process(originals)
+                elapsed = time.perf_counter() - start
+                pipeline.close()
+                print(f"{processes:>10} {elapsed:>9.2f} {len(results) / elapsed:>9.1f}")
+
+            key = "bench0_photo.jpg"
+            sizes = {"original": len(store.get(key))}
+            for name, size, fmt in PHOTO_VARIANTS:
+                sizes[name] = len(store.get(variant_key(key, name, fmt)))
+            print()
+            for name, size in sizes.items():
+                print(f"{name:>10} {size / 1024:>9.1f} KiB")
+        finally:
+            if mock is not None:
+                mock.stop()
+
+
+if __name__ == "__main__":
+    main()
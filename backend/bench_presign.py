@@ -0,0 +1,89 @@
+"""
+Benchmark upload signing against a local S3 stand-in.
+
+Uses moto's in-process S3 by default, or any S3-compatible endpoint such as
+MinIO when S3_ENDPOINT_URL is set. Compares signing N keys through N
+single-file requests against one batch request, for PUT URLs and POST policies.
+
+    python bench_presign.py [N]
+"""
+import os
+import sys
+import time
+import boto3
+
+N_DEFAULT = 200
+BUCKET = "bench-uploads"
+
+
+def make_client():
+    return boto3.client(
+        "s3",
+        region_name="us-east-1",
+        endpoint_url=os.getenv("S3_ENDPOINT_URL"),
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID", "testing"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY", "testing"),
+    )
+
+
+def time_signing(client, n, method):
+    from uploads import sign_upload
+
+    start = time.perf_counter()
+    for i in range(n):
+        sign_upload(f"photo_{i}.jpg", method, client=client, bucket=BUCKET)
+    return time.perf_counter() - start
+
+
+def time_endpoints(client, n, method):
+    """Time n single-file requests against one batch of n through the Flask test client."""
+    import uploads
+    from flask_jwt_extended import create_access_token
+    from app import app
+
+    uploads.s3_client = client
+    uploads.S3_BUCKET_NAME = BUCKET
+    app.config["JWT_SECRET_KEY"] = app.config.get("JWT_SECRET_KEY") or "bench-secret"
+    with app.app_context():
+        token = create_access_token(identity="bench@example.com")
+    headers = {"Authorization": f"Bearer {token}"}
+    test_client = app.test_client()
+
+    start = time.perf_counter()
+    for i in range(n):
+        test_client.post("/api/generate-presigned-url", headers=headers,
+                         json={"file_name": f"photo_{i}.jpg", "method": method})
+    single = time.perf_counter() - start
+
+    names = [f"photo_{i}.jpg" for i in range(n)]
+    start = time.perf_counter()
+    for offset in range(0, n, uploads.MAX_BATCH_UPLOADS):
+        test_client.post("/api/generate-presigned-urls", headers=headers,
+                         json={"file_names": names[offset:offset + uploads.MAX_BATCH_UPLOADS], "method": method})
+    batch = time.perf_counter() - start
+    return single, batch
+
+
+def run(n):
+    client = make_client()
+    client.create_bucket(Bucket=BUCKET)
+
+    for method in ("put", "post"):
+        elapsed = time_signing(client, n, method)
+        print(f"sign {method:<4} x{n}: {elapsed * 1000:8.1f} ms total, {elapsed / n * 1e6:7.1f} us/key")
+
+    for method in ("put", "post"):
+        single, batch = time_endpoints(client, n, method)
+        print(f"http {method:<4} x{n}: single {single * 1000:8.1f} ms, batch {batch * 1000:8.1f} ms "
+              f"({single / batch:.1f}x)")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else N_DEFAULT
+    if os.getenv("S3_ENDPOINT_URL"):
+        run(n)
+    else:
+        from moto import mock_aws
+
+        with mock_aws():
+            run(n)
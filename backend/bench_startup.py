@@ -0,0 +1,62 @@
+"""
+Benchmark cold start: time from a fresh interpreter to a ready Flask app.
+
+Each run spawns a new Python process that imports app (which calls
+create_app()) and reports how long that took, so module caches from earlier
+runs cannot hide regressions.
+
+    python bench_startup.py [--runs 10] [--max-ms 800] [--no-swagger]
+
+With --max-ms the script exits non-zero when the median exceeds the budget.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+ready = time.perf_counter()
+heavy = [name for name in ("boto3", "botocore", "flasgger") if name in sys.modules]
+print(json.dumps({"ms": (ready - start) * 1000, "loaded": heavy}))
+"""
+
+
+def measure(swagger=True):
+    env = dict(os.environ, SWAGGER_ENABLED="true" if swagger else "false")
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=None, help="fail if the median exceeds this")
+    parser.add_argument("--no-swagger", action="store_true", help="measure with SWAGGER_ENABLED=false")
+    args = parser.parse_args()
+
+    results = [measure(swagger=not args.no_swagger) for _ in range(args.runs)]
+    times = sorted(result["ms"] for result in results)
+    median = statistics.median(times)
+    print(f"create_app() import-to-ready over {args.runs} runs: "
+          f"median {median:.1f} ms, min {times[0]:.1f} ms, max {times[-1]:.1f} ms")
+    print(f"heavy modules loaded at startup: {', '.join(results[0]['loaded']) or 'none'}")
+
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"FAIL: median {median:.1f} ms exceeds budget of {args.max_ms:.1f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# Per-user completed-task sets, so open tasks come from memory instead of a NOT IN query
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import distinct, event, func
+from sqlalchemy.orm import Session
+from events import broadcaster
+from models import db, UserTasks
+
+# Backstop for completions this worker neither committed nor heard about on the event feed
+COMPLETED_TASKS_TTL_SECONDS = 300
+COMPLETED_TASKS_MAX_ENTRIES = 10000
+
+
+def to_bitset(task_ids):
+    """Pack task ids into an int with bit ``task_id`` set for each."""
+    bits = 0
+    for task_id in task_ids:
+        bits |= 1 << task_id
+    return bits
+
+
+def has_task(bits, task_id):
+    return bits >> task_id & 1
+
+
+class CompletedTaskCache:
+    """
+    TTL + LRU cache of each user's completed task ids, kept as a bitset.
+
+    Task ids are small and dense, so one Python int per user holds the whole
+    set in a few bytes. Misses for many users are filled by one grouped
+    query. Commits in this process set bits as soon as they succeed, and
+    completion events from other workers set them when the event feed
+    delivers them; the TTL covers anything either path misses.
+    """
+
+    def __init__(self, ttl=COMPLETED_TASKS_TTL_SECONDS, max_entries=COMPLETED_TASKS_MAX_ENTRIES):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # Completions of uncached users that land while a fill is running,
+        # merged into its results in case its query ran before they committed
+        self._fills = 0
+        self._late = {}
+
+    def get(self, user_id):
+        """Return the user's completed-task bitset."""
+        return self.get_many([user_id])[user_id]
+
+    def get_many(self, user_ids):
+        """Return ``{user_id: bitset}``, loading every miss in one query."""
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for user_id in user_ids:
+                entry = self._entries.get(user_id)
+                if entry is not None and now < entry[1]:
+                    self._entries.move_to_end(user_id)
+                    found[user_id] = entry[0]
+            missing = [user_id for user_id in set(user_ids) if user_id not in found]
+            if not missing:
+                return found
+            self._fills += 1
+
+        try:
+            loaded = self._load(missing)
+        finally:
+            with self._lock:
+                self._fills -= 1
+                late = self._late
+                if not self._fills:
+                    self._late = {}
+
+        expires_at = time.monotonic() + self._ttl
+        with self._lock:
+            for user_id, bits in loaded.items():
+                bits |= late.get(user_id, 0)
+                self._entries[user_id] = (bits, expires_at)
+                self._entries.move_to_end(user_id)
+                found[user_id] = bits
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return found
+
+    def add(self, user_id, task_ids):
+        """Set bits for completions that have been committed."""
+        bits = to_bitset(task_ids)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries[user_id] = (entry[0] | bits, entry[1])
+            elif self._fills:
+                self._late[user_id] = self._late.get(user_id, 0) | bits
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @staticmethod
+    def _load(user_ids):
+        rows = db.session.query(UserTasks.user_id, func.array_agg(distinct(UserTasks.task_id))) \
+            .filter(UserTasks.user_id.in_(user_ids)) \
+            .group_by(UserTasks.user_id)
+        loaded = dict.fromkeys(user_ids, 0)
+        for user_id, task_ids in rows:
+            loaded[user_id] = to_bitset(task_ids)
+        return loaded
+
+    def on_event(self, event_type, data):
+        if event_type == "completion":
+            self.add(data["user_id"], [data["task_id"]])
+        elif event_type == "resync":
+            # Events were lost while the feed was down
+            self.clear()
+
+
+completed_tasks = CompletedTaskCache()
+broadcaster.add_handler(completed_tasks.on_event)
+
+
+def record_completions(user_id, task_ids):
+    """Apply completions to the cache once the current transaction commits."""
+    db.session.info.setdefault("completed_tasks_pending", []).append((user_id, list(task_ids)))
+
+
+def open_tasks(user_id, tasks):
+    """The subset of catalog ``tasks`` the user has not completed, in order."""
+    # Follow completions made by other workers from here on
+    broadcaster.ensure_listening()
+    bits = completed_tasks.get(user_id)
+    return [task for task in tasks if not has_task(bits, task["task_id"])]
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_on_commit(session):
+    for user_id, task_ids in session.info.pop("completed_tasks_pending", ()):
+        completed_tasks.add(user_id, task_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("completed_tasks_pending", None)
@@ -0,0 +1,85 @@
+from flask import Blueprint, current_app, request, jsonify
+from flask_jwt_extended import jwt_required
+from identity import current_identity
+from metrics import query_budget
+from pagination import MAX_PAGE_SIZE
+from task_catalog import conditional_response
+from task_routes import open_tasks_for_user, recent_completions
+
+# Create a Blueprint for dashboard routes
+dashboard_routes = Blueprint("dashboard_routes", __name__)
+
+DEFAULT_RECENT_COUNT = 5
+
+
+@dashboard_routes.route("/api/dashboard", methods=["GET"])
+@jwt_required()
+@query_budget(5)
+def get_dashboard():
+    """
+    Get everything the dashboard needs in one round trip.
+    ---
+    tags:
+      - Dashboard
+    parameters:
+      - name: recent
+        in: query
+        required: false
+        schema:
+          type: integer
+          default: 5
+        description: Number of recent completions to include (max 200)
+    responses:
+      200:
+        description: Profile, recent completions and open tasks for the current user
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                profile:
+                  type: object
+                  properties:
+                    email:
+                      type: string
+                      description: Email address of the user
+                    user_since:
+                      type: string
+                      description: Date and time the user was created
+                recent_tasks:
+                  type: array
+                  description: Same items as /api/user-tasks/recent/<n>
+                  items:
+                    type: object
+                not_completed_tasks:
+                  type: array
+                  description: Same items as /api/tasks/not-completed
+                  items:
+                    type: object
+      304:
+        description: Dashboard unchanged since the ETag sent in If-None-Match
+      404:
+        description: User not found
+      500:
+        description: Server error
+    """
+    recent = request.args.get("recent", DEFAULT_RECENT_COUNT, type=int)
+    recent = max(1, min(recent, MAX_PAGE_SIZE))
+
+    user = current_identity()
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+
+    try:
+        response = jsonify({
+            "profile": {
+                "email": user.email,
+                "user_since": user.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+            },
+            "recent_tasks": recent_completions(recent),
+            "not_completed_tasks": open_tasks_for_user(user.user_id),
+        })
+        return conditional_response(response)
+    except Exception as e:
+        current_app.logger.exception(e)
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,35 @@
+# Server-sent events for live completions and team scores
+from flask import Blueprint
+from flask_jwt_extended import jwt_required
+from events import event_stream
+
+# Create a Blueprint for event routes
+event_routes = Blueprint("event_routes", __name__)
+
+
+@event_routes.route("/api/events", methods=["GET"])
+# EventSource cannot set headers, so browsers pass the token as ?jwt=
+@jwt_required(locations=["headers", "query_string"])
+def get_events():
+    """
+    Subscribe to live completion and team score events.
+    ---
+    tags:
+      - Events
+    parameters:
+      - name: jwt
+        in: query
+        required: false
+        type: string
+        description: Access token, for clients that cannot send the Authorization header
+    produces:
+      - text/event-stream
+    responses:
+      200:
+        description: >
+          A text/event-stream. `completion` events carry the same fields as
+          /api/user-tasks/recent/<n> entries; `team_points` events carry
+          team_id, delta and total_points; `resync` means events were missed
+          and the client should refetch.
+    """
+    return event_stream()
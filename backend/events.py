@@ -0,0 +1,192 @@
+# Live completion feed: Postgres LISTEN/NOTIFY fanned out to server-sent event clients
+import json
+import logging
+import queue
+import select
+import threading
+import time
+from flask import Response, current_app
+from sqlalchemy import text
+from models import db
+
+logger = logging.getLogger("snapstronaut.events")
+
+EVENTS_CHANNEL = "snapstronaut_events"
+SUBSCRIBER_QUEUE_SIZE = 100
+KEEPALIVE_SECONDS = 15
+RECONNECT_SECONDS = 5
+# Sent when a client may have missed events; it should refetch its data
+RESYNC_FRAME = "event: resync\ndata: {}\n\n"
+
+
+def publish(events):
+    """
+    Queue ``[(event_type, data), ...]`` for broadcast in the caller's transaction.
+
+    NOTIFY is transactional: Postgres delivers the events when the transaction
+    commits and drops them on rollback, so listeners never see a completion
+    that did not happen. All events go out in one statement.
+    """
+    payloads = [json.dumps({"type": event_type, "data": data}, default=str) for event_type, data in events]
+    if payloads:
+        db.session.execute(
+            text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+            {"channel": EVENTS_CHANNEL, "payloads": payloads},
+        )
+
+
+def _parse(payload):
+    """Decode a NOTIFY payload into ``(event_type, data)``, or None if it is malformed."""
+    try:
+        event = json.loads(payload)
+        return event["type"], event["data"]
+    except (ValueError, KeyError, TypeError):
+        logger.warning("Ignoring malformed event payload: %s", payload)
+        return None
+
+
+def _frame(event_type, data):
+    """SSE frame for one event, built once per event rather than once per client."""
+    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+class EventBroadcaster:
+    """
+    One LISTEN connection per worker process, fanned out to every SSE client.
+
+    Each client gets a bounded queue. A client that stops reading has its
+    backlog replaced by a single resync event instead of holding memory or
+    slowing the others down.
+
+    In-process caches can follow the feed too: handlers added with
+    ``add_handler`` are called as ``handler(event_type, data)`` on the
+    listener thread, and with ``("resync", {})`` after a reconnect.
+    """
+
+    def __init__(self, channel=EVENTS_CHANNEL, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.channel = channel
+        self._queue_size = queue_size
+        self._subscribers = set()
+        self._handlers = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=self._queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        self.ensure_listening()
+        return subscriber
+
+    def add_handler(self, handler):
+        with self._lock:
+            self._handlers.append(handler)
+
+    def ensure_listening(self):
+        """Start the listener thread; needs an app context the first time."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                # Started on first use so that workers without SSE clients or handlers hold no connection
+                self._thread = threading.Thread(
+                    target=self._listen, args=(current_app._get_current_object(),),
+                    name="event-listener", daemon=True,
+                )
+                self._thread.start()
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def broadcast(self, frame):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(frame)
+            except queue.Full:
+                self._resync(subscriber)
+
+    def _resync(self, subscriber):
+        try:
+            while True:
+                subscriber.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            subscriber.put_nowait(RESYNC_FRAME)
+        except queue.Full:
+            pass
+
+    def _listen(self, app):
+        resync = False
+        while True:
+            try:
+                with app.app_context():
+                    connection = db.engine.raw_connection()
+                # Held for the life of the process, so take it out of the request pool
+                connection.detach()
+                try:
+                    if resync:
+                        # Events sent while we were disconnected are lost
+                        with self._lock:
+                            subscribers = list(self._subscribers)
+                        for subscriber in subscribers:
+                            self._resync(subscriber)
+                        self._dispatch("resync", {})
+                    self._pump(connection.driver_connection)
+                finally:
+                    connection.close()
+            except Exception:
+                logger.exception("Event listener lost its connection; reconnecting")
+            resync = True
+            time.sleep(RECONNECT_SECONDS)
+
+    def _pump(self, connection):
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+        while True:
+            if select.select([connection], [], [], KEEPALIVE_SECONDS) == ([], [], []):
+                continue
+            connection.poll()
+            while connection.notifies:
+                event = _parse(connection.notifies.pop(0).payload)
+                if event:
+                    self._dispatch(*event)
+                    self.broadcast(_frame(*event))
+
+    def _dispatch(self, event_type, data):
+        with self._lock:
+            handlers = list(self._handlers)
+        for handler in handlers:
+            try:
+                handler(event_type, data)
+            except Exception:
+                logger.exception("Event handler %r failed", handler)
+
+
+broadcaster = EventBroadcaster()
+
+
+def event_stream():
+    """SSE response that relays broadcast events until the client disconnects."""
+    subscriber = broadcaster.subscribe()
+
+    def generate():
+        try:
+            yield f"retry: {RECONNECT_SECONDS * 1000}\n\n"
+            while True:
+                try:
+                    yield subscriber.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    # Comment line; keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+        finally:
+            broadcaster.unsubscribe(subscriber)
+
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
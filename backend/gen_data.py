@@ -0,0 +1,320 @@
+"""
+Generate a large synthetic crew and completion history for scaling tests.
+
+Activity is skewed the way real usage is: a power-law spread of completions
+across users (a few hot users do most of the work) and timestamps clustered
+into bursts around shift changes rather than spread evenly.
+
+Loads into the PostgreSQL database from .env with COPY, or into a SQLite
+file as a stand-in when no Postgres is at hand:
+
+    python gen_data.py --users 1000000 --completions 10000000
+    python gen_data.py --users 50000 --completions 500000 --sqlite scale.db
+
+Rows are generated and loaded in chunks, so memory stays flat at any size.
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import sqlite3
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from werkzeug.security import generate_password_hash
+
+# Load environment variables from .env file
+load_dotenv()
+
+CHUNK_ROWS = 100_000
+
+# Same catalog initdb.py seeds, as (task_name, description, points)
+SEED_TASKS = [
+    ('Call a Family Member', 'Take 10 minutes to call a loved one back home and catch up.', 10),
+    ('Take a Shower', 'Refresh yourself with a quick shower and hygiene routine.', 5),
+    ('Chat with a Team Member', 'Have a casual chat with a teammate to build camaraderie.', 5),
+    ('Watch a Movie', 'Relax and unwind by watching a movie in the recreation area.', 10),
+    ('Write in Journal', 'Take some time to reflect and write in your personal journal.', 5),
+    ('Read a Book', 'Read a chapter of a book or an article you find interesting.', 10),
+    ('Exercise Routine', 'Complete a 30-minute physical exercise session.', 15),
+    ('Meditate', 'Spend 10 minutes meditating to maintain mental well-being.', 5),
+    ('Listen to Music', 'Take a break and listen to some of your favorite tunes.', 5),
+    ('Video Call with Friends', 'Use the video link to catch up with friends for 15 minutes.', 10),
+]
+
+
+class Skew:
+    """Samplers for hot users and bursty completion times."""
+
+    def __init__(self, rng, users, days, zipf_alpha, bursts_per_day):
+        self.rng = rng
+        self.users = users
+        # Cumulative power-law weights over a shuffled user order, so hot
+        # users are not simply the lowest ids
+        order = list(range(users))
+        rng.shuffle(order)
+        self._order = order
+        self._cumulative = []
+        total = 0.0
+        for rank in range(1, users + 1):
+            total += 1.0 / rank ** zipf_alpha
+            self._cumulative.append(total)
+        self._total = total
+
+        end = datetime.utcnow()
+        start = end - timedelta(days=days)
+        span = (end - start).total_seconds()
+        self._bursts = sorted(start + timedelta(seconds=rng.random() * span)
+                              for _ in range(max(1, int(days * bursts_per_day))))
+        self._start = start
+        self._span = span
+
+    def user_index(self):
+        rank = bisect_left(self._cumulative, self.rng.random() * self._total)
+        return self._order[min(rank, self.users - 1)]
+
+    def timestamp(self):
+        # 80% of completions land within ~20 minutes of a burst, the rest anywhere
+        if self.rng.random() < 0.8:
+            centre = self.rng.choice(self._bursts)
+            return centre + timedelta(seconds=self.rng.gauss(0, 600))
+        return self._start + timedelta(seconds=self.rng.random() * self._span)
+
+
+def team_rows(first_id, teams):
+    for i in range(teams):
+        team_id = first_id + i
+        yield (team_id, f"Synthetic Team {team_id}", f"SYN{team_id}")
+
+
+def user_rows(first_id, users, first_team_id, teams, password_hash, rng):
+    for i in range(users):
+        user_id = first_id + i
+        team_id = first_team_id + rng.randrange(teams)
+        yield (user_id, f"crew{user_id}@synthetic.test", f"crew{user_id}", password_hash, team_id)
+
+
+def completion_rows(first_id, completions, first_user_id, task_ids, skew, rng):
+    for i in range(completions):
+        user_task_id = first_id + i
+        user_id = first_user_id + skew.user_index()
+        task_id = rng.choice(task_ids)
+        completed_at = skew.timestamp()
+        photo_url = f"https://synthetic.invalid/{user_task_id}.jpg"
+        yield (user_task_id, user_id, task_id, photo_url, completed_at.strftime("%Y-%m-%d %H:%M:%S"))
+
+
+def chunks(rows, size=CHUNK_ROWS):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class PostgresTarget:
+    def __init__(self):
+        import psycopg2
+
+        self.connection = psycopg2.connect(
+            host=os.getenv("DB_HOST"),
+            port=os.getenv("DB_PORT"),
+            database=os.getenv("DB_NAME"),
+            user=os.getenv("DB_USER"),
+            password=os.getenv("DB_PASSWORD")
+        )
+        self.cursor = self.connection.cursor()
+
+    def next_id(self, table, column):
+        self.cursor.execute(f"SELECT COALESCE(MAX({column}), 0) + 1 FROM {table};")
+        return self.cursor.fetchone()[0]
+
+    def task_ids(self):
+        self.cursor.execute("SELECT task_id FROM Tasks ORDER BY task_id;")
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def load(self, table, columns, rows):
+        for chunk in chunks(rows):
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(chunk)
+            buffer.seek(0)
+            self.cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+            self.connection.commit()
+
+    def finish(self):
+        # Move the SERIAL sequences past the explicit ids
+        for table, column in (("Teams", "team_id"), ("Users", "user_id"), ("UserTasks", "user_task_id")):
+            self.cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table.lower()}', '{column}'), "
+                f"(SELECT MAX({column}) FROM {table}));"
+            )
+        for statement in REFRESH_TOTALS:
+            self.cursor.execute(statement)
+        self.cursor.execute("ANALYZE;")
+        self.connection.commit()
+        self.connection.close()
+
+
+class SQLiteTarget:
+    """Stand-in target with the same tables and indexes as the Postgres schema (JSONB as TEXT)."""
+
+    SCHEMA = [
+        """CREATE TABLE IF NOT EXISTS Teams (
+            team_id INTEGER PRIMARY KEY, team_name VARCHAR(100) UNIQUE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, join_id VARCHAR(10) UNIQUE)""",
+        """CREATE TABLE IF NOT EXISTS Users (
+            user_id INTEGER PRIMARY KEY, email VARCHAR(320) UNIQUE NOT NULL,
+            password VARCHAR(255) NOT NULL, username VARCHAR(100) NOT NULL,
+            team_id INT REFERENCES Teams(team_id), created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""",
+        """CREATE TABLE IF NOT EXISTS Tasks (
+            task_id INTEGER PRIMARY KEY, task_name VARCHAR(100) NOT NULL, description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, points INT DEFAULT 0)""",
+        """CREATE TABLE IF NOT EXISTS UserTasks (
+            user_task_id INTEGER PRIMARY KEY, user_id INT NOT NULL REFERENCES Users(user_id),
+            task_id INT NOT NULL REFERENCES Tasks(task_id), photo_url VARCHAR(255),
+            completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, idempotency_key VARCHAR(64),
+            photo_variants TEXT, photo_attempts SMALLINT NOT NULL DEFAULT 0, photo_retry_at TIMESTAMP)""",
+        """CREATE TABLE IF NOT EXISTS TeamPoints (
+            team_id INT PRIMARY KEY REFERENCES Teams(team_id), total_points INT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""",
+        """CREATE TABLE IF NOT EXISTS UserPoints (
+            user_id INT PRIMARY KEY REFERENCES Users(user_id), total_points INT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""",
+        """CREATE TABLE IF NOT EXISTS UserPointCounts (
+            total_points INT PRIMARY KEY, users INT NOT NULL DEFAULT 0)""",
+        "CREATE INDEX IF NOT EXISTS ix_usertasks_completed_at ON UserTasks (completed_at DESC, user_task_id DESC)",
+        "CREATE INDEX IF NOT EXISTS ix_usertasks_user_task ON UserTasks (user_id, task_id)",
+        "CREATE INDEX IF NOT EXISTS ix_usertasks_task_id ON UserTasks (task_id)",
+        "CREATE INDEX IF NOT EXISTS ix_users_team_id ON Users (team_id)",
+        "CREATE INDEX IF NOT EXISTS ix_userpoints_rank ON UserPoints (total_points DESC, user_id)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_usertasks_idempotency "
+        "ON UserTasks (user_id, idempotency_key) WHERE idempotency_key IS NOT NULL",
+        "CREATE INDEX IF NOT EXISTS ix_usertasks_photo_pending ON UserTasks (user_task_id) WHERE photo_variants IS NULL",
+    ]
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.cursor = self.connection.cursor()
+        for statement in self.SCHEMA:
+            self.cursor.execute(statement)
+        self.cursor.execute("SELECT COUNT(*) FROM Tasks;")
+        if self.cursor.fetchone()[0] == 0:
+            self.cursor.executemany(
+                "INSERT INTO Tasks (task_name, description, points) VALUES (?, ?, ?);", SEED_TASKS
+            )
+        self.connection.commit()
+
+    def next_id(self, table, column):
+        self.cursor.execute(f"SELECT COALESCE(MAX({column}), 0) + 1 FROM {table};")
+        return self.cursor.fetchone()[0]
+
+    def task_ids(self):
+        self.cursor.execute("SELECT task_id FROM Tasks ORDER BY task_id;")
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def load(self, table, columns, rows):
+        placeholders = ", ".join("?" for _ in columns)
+        for chunk in chunks(rows):
+            self.cursor.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders});", chunk
+            )
+            self.connection.commit()
+
+    def finish(self):
+        for statement in REFRESH_TOTALS:
+            self.cursor.execute(statement)
+        self.cursor.execute("ANALYZE;")
+        self.connection.commit()
+        self.connection.close()
+
+
+# Recompute the materialized totals after a bulk load (valid in Postgres and SQLite)
+REFRESH_TOTALS = [
+    """
+    INSERT INTO TeamPoints (team_id, total_points)
+    SELECT t.team_id, COALESCE(SUM(k.points), 0)
+    FROM Teams t
+    LEFT JOIN Users u ON u.team_id = t.team_id
+    LEFT JOIN UserTasks ut ON ut.user_id = u.user_id
+    LEFT JOIN Tasks k ON k.task_id = ut.task_id
+    WHERE true
+    GROUP BY t.team_id
+    ON CONFLICT (team_id) DO UPDATE SET total_points = excluded.total_points;
+    """,
+    """
+    INSERT INTO UserPoints (user_id, total_points)
+    SELECT u.user_id, COALESCE(SUM(k.points), 0)
+    FROM Users u
+    LEFT JOIN UserTasks ut ON ut.user_id = u.user_id
+    LEFT JOIN Tasks k ON k.task_id = ut.task_id
+    WHERE true
+    GROUP BY u.user_id
+    ON CONFLICT (user_id) DO UPDATE SET total_points = excluded.total_points;
+    """,
+    # Postgres keeps these in step by trigger; recounting also covers SQLite
+    "DELETE FROM UserPointCounts;",
+    """
+    INSERT INTO UserPointCounts (total_points, users)
+    SELECT total_points, COUNT(*) FROM UserPoints GROUP BY total_points;
+    """,
+]
+
+
+def generate(target, args):
+    rng = random.Random(args.seed)
+    task_ids = target.task_ids()
+    if not task_ids:
+        raise SystemExit("No tasks found; run initdb.py first")
+
+    # Every synthetic user shares one hash: hashing millions of passwords would dominate the run
+    password_hash = generate_password_hash(args.password)
+
+    first_team_id = target.next_id("Teams", "team_id")
+    first_user_id = target.next_id("Users", "user_id")
+    first_user_task_id = target.next_id("UserTasks", "user_task_id")
+
+    started = time.perf_counter()
+    target.load("Teams", ("team_id", "team_name", "join_id"), team_rows(first_team_id, args.teams))
+    print(f"Loaded {args.teams} teams")
+
+    target.load(
+        "Users", ("user_id", "email", "username", "password", "team_id"),
+        user_rows(first_user_id, args.users, first_team_id, args.teams, password_hash, rng),
+    )
+    print(f"Loaded {args.users} users")
+
+    skew = Skew(rng, args.users, args.days, args.zipf_alpha, args.bursts_per_day)
+    target.load(
+        "UserTasks", ("user_task_id", "user_id", "task_id", "photo_url", "completed_at"),
+        completion_rows(first_user_task_id, args.completions, first_user_id, task_ids, skew, rng),
+    )
+    print(f"Loaded {args.completions} completions")
+
+    target.finish()
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--teams", type=int, default=50)
+    parser.add_argument("--completions", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=90, help="span of completion history")
+    parser.add_argument("--zipf-alpha", type=float, default=1.1, help="user activity skew; higher is hotter")
+    parser.add_argument("--bursts-per-day", type=float, default=3, help="completion bursts (shift changes) per day")
+    parser.add_argument("--password", default="synthetic-password", help="password shared by every synthetic user")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--sqlite", metavar="PATH", help="load into this SQLite file instead of Postgres")
+    args = parser.parse_args()
+
+    target = SQLiteTarget(args.sqlite) if args.sqlite else PostgresTarget()
+    generate(target, args)
+
+
+if __name__ == "__main__":
+    main()
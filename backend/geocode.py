@@ -0,0 +1,288 @@
+# Reverse geocoding behind a spatially bucketed cache and an optional offline polygon index
+import json
+import logging
+import os
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+
+GEOCODE_URL = os.getenv("GEOCODE_URL", "https://nominatim.openstreetmap.org/reverse")
+GEOCODE_USER_AGENT = os.getenv("GEOCODE_USER_AGENT", "snapstronaut/1.0")
+# GeoJSON of country and ocean/sea polygons (e.g. Natural Earth admin-0 + marine areas)
+GEOCODE_POLYGONS_PATH = os.getenv("GEOCODE_POLYGONS_PATH")
+# Geohash length of a cache cell; 5 characters is roughly 5 km x 5 km
+GEOCODE_PRECISION = int(os.getenv("GEOCODE_PRECISION", 5))
+# Open-water answers cover much more than a land cell: 3 characters is roughly 156 km x 156 km,
+# so the ISS ground track (about 40 km per 5 s poll) keeps hitting them
+GEOCODE_WATER_PRECISION = int(os.getenv("GEOCODE_WATER_PRECISION", 3))
+GEOCODE_CACHE_MAX_ENTRIES = int(os.getenv("GEOCODE_CACHE_MAX_ENTRIES", 50000))
+GEOCODE_CACHE_TTL_SECONDS = 7 * 24 * 3600
+GEOCODE_TIMEOUT_SECONDS = 5
+# Nominatim's usage policy allows one request per second; callers queue for a slot
+# for up to GEOCODE_TIMEOUT_SECONDS
+GEOCODE_MIN_INTERVAL_SECONDS = float(os.getenv("GEOCODE_MIN_INTERVAL_SECONDS", 1))
+# Grid used to find candidate polygons for a point
+POLYGON_INDEX_CELL_DEG = 1
+
+logger = logging.getLogger("snapstronaut.geocode")
+
+WATER_CLASSES = {"ocean", "sea", "bay", "gulf", "strait", "sound", "channel", "lagoon", "fjord", "inlet"}
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+class GeocoderUnavailable(RuntimeError):
+    """Raised when a location needs the upstream geocoder and it cannot be used."""
+
+
+def geohash(lat, lng, precision=GEOCODE_PRECISION):
+    """Standard base-32 geohash of a point."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        span, coordinate = (lng_range, lng) if even else (lat_range, lat)
+        middle = (span[0] + span[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            span[0] = middle
+        else:
+            span[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def _place(city=None, state=None, country=None):
+    # Same fallbacks the map page used to apply client-side
+    return {
+        "city": city or "Over Ocean",
+        "state": state or "",
+        "country": country or "International Waters",
+    }
+
+
+# What the upstream answers far from any coast
+OPEN_WATER = _place()
+
+
+class NominatimSource:
+    """Reverse geocoder speaking the Nominatim ``/reverse`` JSON format."""
+
+    def __init__(self, url=GEOCODE_URL, timeout=GEOCODE_TIMEOUT_SECONDS, user_agent=GEOCODE_USER_AGENT):
+        self.url = url
+        self.timeout = timeout
+        self.user_agent = user_agent
+
+    def __call__(self, lat, lng):
+        query = urllib.parse.urlencode({"lat": lat, "lon": lng, "format": "json", "zoom": 10})
+        req = urllib.request.Request(f"{self.url}?{query}", headers={"User-Agent": self.user_agent})
+        with urllib.request.urlopen(req, timeout=self.timeout) as response:
+            data = json.load(response)
+        address = data.get("address") or {}
+        return _place(
+            address.get("city") or address.get("town") or address.get("county"),
+            address.get("state") or address.get("region"),
+            address.get("country"),
+        )
+
+
+class PolygonIndex:
+    """
+    Point-in-polygon lookup over country and water polygons.
+
+    Polygons are bucketed by the 1 degree cells their bounding boxes touch,
+    so a lookup tests only the few polygons near the point, each with one
+    vectorized crossing count over its edges.
+    """
+
+    def __init__(self, features):
+        import numpy as np
+
+        self._np = np
+        self._buckets = {}
+        for feature in features:
+            properties = feature.get("properties") or {}
+            name = properties.get("name") or properties.get("NAME") or properties.get("ADMIN")
+            geometry = feature.get("geometry") or {}
+            if not name or geometry.get("type") not in ("Polygon", "MultiPolygon"):
+                continue
+            kind = str(properties.get("featurecla") or properties.get("kind") or "").lower()
+            water = kind in WATER_CLASSES or kind == "water"
+            polygons = [geometry["coordinates"]] if geometry["type"] == "Polygon" else geometry["coordinates"]
+            for rings in polygons:
+                # Edges of all rings together; even-odd counting handles holes
+                # Positions may carry an altitude; only longitude and latitude matter
+                edges = np.vstack([
+                    np.column_stack([ring[:-1, :2], ring[1:, :2]])
+                    for ring in map(np.asarray, rings) if len(ring) > 1
+                ]).astype(float)
+                entry = (name, water, edges)
+                lng_min, lat_min = edges[:, [0, 1]].min(axis=0)
+                lng_max, lat_max = edges[:, [0, 1]].max(axis=0)
+                for cell in self._cells(lat_min, lng_min, lat_max, lng_max):
+                    self._buckets.setdefault(cell, []).append(entry)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(json.load(f).get("features", []))
+
+    @staticmethod
+    def _cells(lat_min, lng_min, lat_max, lng_max):
+        size = POLYGON_INDEX_CELL_DEG
+        for row in range(int(lat_min // size), int(lat_max // size) + 1):
+            for col in range(int(lng_min // size), int(lng_max // size) + 1):
+                yield row, col
+
+    def lookup(self, lat, lng):
+        """Return ``(name, is_water)`` of the polygon containing the point, or None."""
+        np = self._np
+        cell = (int(lat // POLYGON_INDEX_CELL_DEG), int(lng // POLYGON_INDEX_CELL_DEG))
+        for name, water, edges in self._buckets.get(cell, ()):
+            x0, y0, x1, y1 = edges[:, 0], edges[:, 1], edges[:, 2], edges[:, 3]
+            straddles = (y0 > lat) != (y1 > lat)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                crossing_x = x0 + (lat - y0) * (x1 - x0) / (y1 - y0)
+            if np.count_nonzero(straddles & (lng < crossing_x)) % 2:
+                return name, water
+        return None
+
+
+class ReverseGeocoder:
+    """
+    Reverse geocoding answered locally whenever possible.
+
+    1. Points in a water polygon of the offline index never leave the process.
+    2. Other points share one cached answer per geohash cell (LRU, with TTL),
+       and concurrent misses for a cell wait on one upstream call. Open-water
+       answers are also cached for the coarser ``water_precision`` cell; a
+       land answer inside that cell evicts it.
+    3. The upstream is called at most once per GEOCODE_MIN_INTERVAL_SECONDS;
+       callers wait up to ``max_wait`` seconds for their turn. Beyond that,
+       or when it fails, the index's country answers if it can.
+    """
+
+    def __init__(self, source, index=None, precision=GEOCODE_PRECISION,
+                 max_entries=GEOCODE_CACHE_MAX_ENTRIES, ttl=GEOCODE_CACHE_TTL_SECONDS,
+                 min_interval=GEOCODE_MIN_INTERVAL_SECONDS, water_precision=GEOCODE_WATER_PRECISION,
+                 max_wait=GEOCODE_TIMEOUT_SECONDS, clock=time.monotonic):
+        self.source = source
+        self.index = index
+        self.precision = precision
+        self.water_precision = min(water_precision, precision)
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._min_interval = min_interval
+        self._max_wait = max_wait
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._last_upstream = float("-inf")
+
+    def reverse(self, lat, lng):
+        """Return ``(place, source)`` where source is index, cache or upstream."""
+        indexed = self.index.lookup(lat, lng) if self.index is not None else None
+        if indexed is not None and indexed[1]:
+            return _place(country=indexed[0]), "index"
+
+        cell = geohash(lat, lng, self.precision)
+        water_cell = cell[:self.water_precision]
+        with self._lock:
+            entry = self._cached(cell)
+            if entry is None and indexed is None:
+                # Points the index puts on land never take an open-water answer
+                entry = self._cached(water_cell)
+            if entry is not None:
+                return entry[0], "cache"
+            flight = self._flights.get(cell)
+            leader = flight is None
+            if leader:
+                flight = self._flights[cell] = threading.Event()
+
+        if not leader:
+            flight.wait(self._max_wait + GEOCODE_TIMEOUT_SECONDS)
+            with self._lock:
+                entry = self._entries.get(cell)
+            if entry is not None:
+                return entry[0], "cache"
+            return self._fallback(indexed)
+
+        try:
+            place = self._fetch(lat, lng)
+        except GeocoderUnavailable:
+            place = None
+        except Exception as e:
+            logger.warning("Reverse geocoding %s,%s failed: %s", lat, lng, e)
+            place = None
+        with self._lock:
+            if place is not None:
+                self._store(cell, place)
+                if place == OPEN_WATER:
+                    self._store(water_cell, place)
+                elif water_cell != cell:
+                    # The coarse cell reaches a coast; stop answering it as open water
+                    self._entries.pop(water_cell, None)
+            del self._flights[cell]
+        flight.set()
+        if place is None:
+            return self._fallback(indexed)
+        return place, "upstream"
+
+    def _cached(self, cell):
+        # Caller holds the lock
+        entry = self._entries.get(cell)
+        if entry is None or self._clock() - entry[1] >= self._ttl:
+            return None
+        self._entries.move_to_end(cell)
+        return entry
+
+    def _store(self, cell, place):
+        # Caller holds the lock
+        self._entries[cell] = (place, self._clock())
+        self._entries.move_to_end(cell)
+        if len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def _fetch(self, lat, lng):
+        # Reserve the next free upstream slot, then wait for it outside the lock
+        with self._lock:
+            now = self._clock()
+            slot = max(now, self._last_upstream + self._min_interval)
+            if slot - now > self._max_wait:
+                raise GeocoderUnavailable("Upstream geocoder rate limit reached")
+            self._last_upstream = slot
+        if slot > now:
+            time.sleep(slot - now)
+        return self.source(lat, lng)
+
+    @staticmethod
+    def _fallback(indexed):
+        if indexed is not None:
+            # Country-level only: the index has no finer land divisions
+            return _place(city=indexed[0], country=indexed[0]), "index"
+        raise GeocoderUnavailable("Location is not cached and the geocoder is unavailable")
+
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+
+def get_geocoder():
+    """The process-wide geocoder; the polygon index (if configured) loads on first use."""
+    global _geocoder
+    if _geocoder is None:
+        with _geocoder_lock:
+            if _geocoder is None:
+                index = PolygonIndex.load(GEOCODE_POLYGONS_PATH) if GEOCODE_POLYGONS_PATH else None
+                _geocoder = ReverseGeocoder(NominatimSource(), index)
+    return _geocoder
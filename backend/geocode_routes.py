@@ -0,0 +1,66 @@
+# Reverse geocoding for the ISS position and clicked map locations
+from flask import Blueprint, jsonify, request
+from geocode import get_geocoder, GeocoderUnavailable
+from metrics import query_budget
+
+# Create a Blueprint for geocoding routes
+geocode_routes = Blueprint("geocode_routes", __name__)
+
+
+@geocode_routes.route("/api/geocode/reverse", methods=["GET"])
+@query_budget(0)
+def reverse_geocode():
+    """
+    Describe the place at a latitude/longitude.
+    ---
+    tags:
+      - Geocoding
+    parameters:
+      - name: lat
+        in: query
+        required: true
+        type: number
+        description: Latitude in degrees (-90 to 90)
+      - name: lng
+        in: query
+        required: true
+        type: number
+        description: Longitude in degrees (-180 to 180)
+    responses:
+      200:
+        description: Place name, answered from the offline index, the cell cache or the upstream geocoder
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                city:
+                  type: string
+                  description: City, town or county; "Over Ocean" over water
+                state:
+                  type: string
+                  description: State or region, may be empty
+                country:
+                  type: string
+                  description: Country, or the ocean/sea name over water
+                source:
+                  type: string
+                  description: index, cache or upstream
+      400:
+        description: Missing or out-of-range lat or lng
+      503:
+        description: Location not cached and the upstream geocoder is unavailable
+    """
+    lat = request.args.get("lat", type=float)
+    lng = request.args.get("lng", type=float)
+    if lat is None or lng is None or not -90 <= lat <= 90 or not -180 <= lng <= 180:
+        return jsonify({"error": "lat must be within [-90, 90] and lng within [-180, 180]"}), 400
+
+    try:
+        place, source = get_geocoder().reverse(lat, lng)
+    except GeocoderUnavailable as e:
+        return jsonify({"error": str(e)}), 503
+
+    response = jsonify({**place, "source": source})
+    response.headers["Cache-Control"] = "public, max-age=86400"
+    return response, 200
@@ -0,0 +1,118 @@
+# Idempotency keys for task completion retries
+import threading
+from collections import OrderedDict
+from flask import request
+from models import db, UserTasks
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 64
+RECENT_KEYS_MAX_ENTRIES = 10000
+
+
+class InvalidIdempotencyKey(ValueError):
+    """Raised when a client sends a key that cannot be stored."""
+
+
+def validate_key(key):
+    if key is None:
+        return None
+    if not isinstance(key, str) or not key or len(key) > MAX_KEY_LENGTH:
+        raise InvalidIdempotencyKey(f"Idempotency key must be 1-{MAX_KEY_LENGTH} characters")
+    return key
+
+
+def request_key():
+    """The Idempotency-Key header of the current request, if any."""
+    return validate_key(request.headers.get(IDEMPOTENCY_HEADER))
+
+
+class RecentKeys:
+    """
+    LRU map of (user_id, key) -> completion result for recently seen keys.
+
+    Keys are scoped to the user, not the task: replaying one for a different
+    task is an error (see ``mismatch``), since the unique index would refuse it.
+
+    Answers the common case, a retry arriving seconds after the original,
+    without a query. The unique index on UserTasks stays the source of truth.
+    """
+
+    def __init__(self, max_entries=RECENT_KEYS_MAX_ENTRIES):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, user_id, key):
+        with self._lock:
+            result = self._entries.get((user_id, key))
+            if result is not None:
+                self._entries.move_to_end((user_id, key))
+            return result
+
+    def put(self, user_id, key, result):
+        with self._lock:
+            self._entries[(user_id, key)] = result
+            self._entries.move_to_end((user_id, key))
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+recent_keys = RecentKeys()
+
+
+def _result(completion):
+    return {
+        "user_task_id": completion.user_task_id,
+        "task_id": completion.task_id,
+        "photo_url": completion.photo_url,
+    }
+
+
+def mismatch(result, task_id):
+    """Error message when a recorded key is replayed for another task, else None."""
+    if result["task_id"] != task_id:
+        return f"Idempotency key was already used to complete task {result['task_id']}"
+    return None
+
+
+def remember(user_id, key, completion):
+    if key is not None:
+        recent_keys.put(user_id, key, _result(completion))
+
+
+def lookup(user_id, key):
+    """Return the stored result for ``key``, from the cache or the index, or None."""
+    if key is None:
+        return None
+    result = recent_keys.get(user_id, key)
+    if result is not None:
+        return result
+
+    completion = UserTasks.query.filter_by(user_id=user_id, idempotency_key=key).first()
+    if completion is None:
+        return None
+    result = _result(completion)
+    recent_keys.put(user_id, key, result)
+    return result
+
+
+def lookup_many(user_id, keys):
+    """Resolve many keys at once: cache hits first, then one IN query for the rest."""
+    found = {}
+    missing = []
+    for key in keys:
+        result = recent_keys.get(user_id, key)
+        if result is not None:
+            found[key] = result
+        else:
+            missing.append(key)
+
+    if missing:
+        completions = db.session.query(UserTasks) \
+            .filter(UserTasks.user_id == user_id, UserTasks.idempotency_key.in_(missing)) \
+            .all()
+        for completion in completions:
+            recent_keys.put(user_id, completion.idempotency_key, _result(completion))
+            found[completion.idempotency_key] = _result(completion)
+    return found
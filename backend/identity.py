@@ -0,0 +1,112 @@
+# Resolve the JWT's user without a database round trip on the hot path
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import User
+
+IDENTITY_CACHE_TTL_SECONDS = 300
+IDENTITY_CACHE_MAX_ENTRIES = 1024
+
+Identity = namedtuple("Identity", ["user_id", "email", "username", "team_id", "created_at"])
+
+
+def identity_claims(user):
+    """Additional JWT claims embedded at login."""
+    return {"user_id": user.user_id, "team_id": user.team_id}
+
+
+class IdentityCache:
+    """
+    Small TTL + LRU cache of Identity tuples keyed by user_id.
+
+    Entries are dropped when a commit in this process touches the user; the
+    TTL bounds staleness for changes made by other workers.
+    """
+
+    def __init__(self, ttl=IDENTITY_CACHE_TTL_SECONDS, max_entries=IDENTITY_CACHE_MAX_ENTRIES):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            identity, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return identity
+
+    def put(self, identity):
+        with self._lock:
+            self._entries[identity.user_id] = (identity, time.monotonic() + self._ttl)
+            self._entries.move_to_end(identity.user_id)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+identity_cache = IdentityCache()
+
+
+def current_identity():
+    """
+    Return the Identity of the user behind the current JWT, or None.
+
+    Tokens issued at login carry a user_id claim, so a cache hit needs no
+    query at all and a miss is a primary-key lookup. Older tokens that only
+    carry the email fall back to looking the user up by email.
+    """
+    user_id = get_jwt().get("user_id")
+    if user_id is not None:
+        identity = identity_cache.get(user_id)
+        if identity is not None:
+            return identity
+        user = User.query.get(user_id)
+    else:
+        user = User.query.filter_by(email=get_jwt_identity()).first()
+
+    if not user:
+        return None
+    identity = Identity(
+        user_id=user.user_id,
+        email=user.email,
+        username=user.username,
+        team_id=user.team_id,
+        created_at=user.created_at,
+    )
+    identity_cache.put(identity)
+    return identity
+
+
+@event.listens_for(Session, "before_flush")
+def _mark_user_changes(session, flush_context, instances):
+    changed = session.dirty | session.deleted
+    user_ids = {obj.user_id for obj in changed if isinstance(obj, User)}
+    if user_ids:
+        session.info.setdefault("identity_cache_dirty", set()).update(user_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    for user_id in session.info.pop("identity_cache_dirty", ()):
+        identity_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("identity_cache_dirty", None)
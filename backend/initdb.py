@@ -1,6 +1,7 @@
 import os
 import psycopg2
 from dotenv import load_dotenv
+from migrate import upgrade
 
 # Load environment variables from .env file
 load_dotenv()
@@ -25,6 +26,18 @@ connection = psycopg2.connect(
 cursor = connection.cursor()
 
 try:
+    cursor.execute("""
+    DROP TABLE IF EXISTS schema_migrations;
+    """)
+    cursor.execute("""
+    DROP TABLE IF EXISTS TeamPoints CASCADE;
+    """)
+    cursor.execute("""
+    DROP TABLE IF EXISTS UserPointCounts;
+    """)
+    cursor.execute("""
+    DROP TABLE IF EXISTS UserPoints CASCADE;
+    """)
     cursor.execute("""
     DROP TABLE IF EXISTS Users CASCADE;
     """)
@@ -103,11 +116,41 @@ try:
     );
     """)
 
+    # Create TeamPoints table holding each team's materialized point total
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS TeamPoints (
+        team_id INT PRIMARY KEY REFERENCES Teams(team_id) ON DELETE CASCADE,
+        total_points INT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+
+    # Seed a zero total for every team so the leaderboard lists them all
+    cursor.execute("""
+    INSERT INTO TeamPoints (team_id, total_points)
+    SELECT team_id, 0 FROM Teams
+    ON CONFLICT (team_id) DO NOTHING;
+    """)
+
+    # Create UserPoints table holding each user's materialized point total
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS UserPoints (
+        user_id INT PRIMARY KEY REFERENCES Users(user_id) ON DELETE CASCADE,
+        total_points INT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+
     # Commit changes
     connection.commit()
     print("Tables created and realistic mock data inserted successfully.")
+
+    # Bring the fresh schema up to the latest migration (indexes etc.)
+    print("Applying migrations...")
+    upgrade(connection)
 except Exception as e:
-    print("Error connecting to the database:", e)
+    print("Database initialization failed:", e)
+    raise
 
 finally:
     cursor.close()
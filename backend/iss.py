@@ -0,0 +1,117 @@
+# Live ISS position, fetched once per interval and shared by every viewer
+import json
+import os
+import threading
+import time
+import urllib.request
+
+ISS_POSITION_URL = os.getenv("ISS_POSITION_URL", "http://api.open-notify.org/iss-now.json")
+ISS_POSITION_TTL_SECONDS = float(os.getenv("ISS_POSITION_TTL_SECONDS", 5))
+ISS_UPSTREAM_TIMEOUT_SECONDS = float(os.getenv("ISS_UPSTREAM_TIMEOUT_SECONDS", 3))
+# How old a cached position may be and still be served while the upstream is failing
+ISS_POSITION_MAX_STALE_SECONDS = 60
+
+
+class UpstreamUnavailable(RuntimeError):
+    """Raised when the position source fails and no usable cached value exists."""
+
+
+class OpenNotifySource:
+    """
+    Reads the open-notify ``iss-now.json`` format from ``url``.
+
+    Any server speaking that format works, so tests and local development can
+    point ISS_POSITION_URL at a stand-in.
+    """
+
+    def __init__(self, url=ISS_POSITION_URL, timeout=ISS_UPSTREAM_TIMEOUT_SECONDS):
+        self.url = url
+        self.timeout = timeout
+
+    def __call__(self):
+        with urllib.request.urlopen(self.url, timeout=self.timeout) as response:
+            data = json.load(response)
+        return {
+            "latitude": float(data["iss_position"]["latitude"]),
+            "longitude": float(data["iss_position"]["longitude"]),
+            "timestamp": int(data["timestamp"]),
+        }
+
+
+class _Flight:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class CoalescingCache:
+    """
+    Caches one value for ``ttl`` seconds with single-flight refreshes.
+
+    When the value expires, the first caller fetches it and every concurrent
+    caller waits for that same fetch, so N viewers cost one upstream call per
+    interval. If the fetch fails, a value up to ``max_stale`` seconds old is
+    served instead of an error.
+    """
+
+    def __init__(self, fetch, ttl, max_stale=0.0, clock=time.monotonic):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._value = None
+        self._fetched_at = None
+        self._flight = None
+
+    def get(self):
+        """Return ``(value, age_seconds)``."""
+        with self._lock:
+            age = self._age()
+            if age is not None and age < self.ttl:
+                return self._value, age
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = _Flight()
+
+        if leader:
+            self._refresh(flight)
+        else:
+            flight.done.wait()
+
+        if flight.error is None:
+            return flight.value, 0.0
+        with self._lock:
+            age = self._age()
+            if age is not None and age < self.max_stale:
+                return self._value, age
+        raise UpstreamUnavailable(str(flight.error)) from flight.error
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+            self._fetched_at = None
+
+    def _age(self):
+        return None if self._fetched_at is None else self._clock() - self._fetched_at
+
+    def _refresh(self, flight):
+        try:
+            flight.value = self.fetch()
+        except Exception as e:
+            flight.error = e
+        with self._lock:
+            if flight.error is None:
+                self._value = flight.value
+                self._fetched_at = self._clock()
+            self._flight = None
+        flight.done.set()
+
+
+iss_position = CoalescingCache(
+    OpenNotifySource(), ISS_POSITION_TTL_SECONDS, max_stale=ISS_POSITION_MAX_STALE_SECONDS
+)
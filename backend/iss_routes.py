@@ -0,0 +1,211 @@
+# ISS tracking data served from shared backend caches
+import math
+import time
+from flask import Blueprint, Response, jsonify, request
+from iss import iss_position, UpstreamUnavailable
+from metrics import query_budget
+
+# Create a Blueprint for ISS routes
+iss_routes = Blueprint("iss_routes", __name__)
+
+PASS_DEFAULT_DAYS = 3
+PASS_MAX_DAYS = 10
+TRACK_MAX_ORBITS = 5
+TRACK_FORMATS = ("polyline", "float32")
+
+
+@iss_routes.route("/api/iss/position", methods=["GET"])
+@query_budget(0)
+def get_iss_position():
+    """
+    Get the current position of the ISS.
+    ---
+    tags:
+      - ISS
+    responses:
+      200:
+        description: Latest ISS position, shared by all clients for a few seconds
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                latitude:
+                  type: number
+                  description: Latitude in degrees
+                longitude:
+                  type: number
+                  description: Longitude in degrees
+                timestamp:
+                  type: integer
+                  description: Unix time of the fix
+      503:
+        description: Position source unavailable
+    """
+    try:
+        position, age = iss_position.get()
+    except UpstreamUnavailable as e:
+        return jsonify({"error": f"ISS position unavailable: {e}"}), 503
+
+    response = jsonify(position)
+    # Let browsers reuse the fix until the shared cache would refresh it anyway
+    response.headers["Cache-Control"] = f"public, max-age={max(0, math.floor(iss_position.ttl - age))}"
+    return response, 200
+
+
+@iss_routes.route("/api/iss/passes", methods=["GET"])
+@query_budget(0)
+def get_iss_passes():
+    """
+    Predict when the ISS passes over a location.
+    ---
+    tags:
+      - ISS
+    parameters:
+      - name: lat
+        in: query
+        required: true
+        type: number
+        description: Latitude in degrees (-90 to 90)
+      - name: lng
+        in: query
+        required: true
+        type: number
+        description: Longitude in degrees (-180 to 180)
+      - name: days
+        in: query
+        required: false
+        type: integer
+        default: 3
+        description: How many days ahead to predict (max 10)
+    responses:
+      200:
+        description: >
+          Passes at least 10 degrees above the horizon, computed offline from
+          the stored TLE. Times are UTC; azimuths are degrees from north.
+      400:
+        description: Missing or out-of-range lat, lng or days
+      503:
+        description: No TLE file available
+    """
+    lat = request.args.get("lat", type=float)
+    lng = request.args.get("lng", type=float)
+    days = request.args.get("days", PASS_DEFAULT_DAYS, type=int)
+    if lat is None or lng is None or not -90 <= lat <= 90 or not -180 <= lng <= 180:
+        return jsonify({"error": "lat must be within [-90, 90] and lng within [-180, 180]"}), 400
+    if not 1 <= days <= PASS_MAX_DAYS:
+        return jsonify({"error": f"days must be between 1 and {PASS_MAX_DAYS}"}), 400
+
+    # NumPy and SGP4 load on first use, keeping them off the app's startup path
+    from orbit import pass_cache, isoformat, TleUnavailable, PASS_MIN_ELEVATION_DEG, TLE_MAX_AGE_DAYS
+
+    try:
+        passes, tle, (cell_lat, cell_lng) = pass_cache.passes(lat, lng, days)
+    except TleUnavailable as e:
+        return jsonify({"error": str(e)}), 503
+
+    response = jsonify({
+        "location": {"lat": round(cell_lat, 4), "lng": round(cell_lng, 4)},
+        "min_elevation": PASS_MIN_ELEVATION_DEG,
+        "tle": {
+            "name": tle.name,
+            "epoch": isoformat(tle.epoch),
+            "stale": abs(time.time() - tle.epoch) > TLE_MAX_AGE_DAYS * 86400,
+        },
+        "passes": [
+            {
+                "rise": isoformat(p["rise"]),
+                "culminate": isoformat(p["culminate"]),
+                "set": isoformat(p["set"]),
+                "duration_seconds": round(p["set"] - p["rise"]),
+                "max_elevation": p["max_elevation"],
+                "rise_azimuth": p["rise_azimuth"],
+                "set_azimuth": p["set_azimuth"],
+            }
+            for p in passes
+        ],
+    })
+    response.headers["Cache-Control"] = "public, max-age=60"
+    return response, 200
+
+
+@iss_routes.route("/api/iss/ground-track", methods=["GET"])
+@query_budget(0)
+def get_iss_ground_track():
+    """
+    Get the ISS ground track for the current and neighbouring orbits.
+    ---
+    tags:
+      - ISS
+    parameters:
+      - name: before
+        in: query
+        required: false
+        type: integer
+        default: 1
+        description: Previous orbits to include (max 5)
+      - name: after
+        in: query
+        required: false
+        type: integer
+        default: 1
+        description: Upcoming orbits to include (max 5)
+      - name: format
+        in: query
+        required: false
+        type: string
+        enum: [polyline, float32]
+        default: polyline
+        description: >
+          polyline returns JSON with Google encoded polylines, one per segment.
+          float32 returns little-endian lat/lng float32 pairs for all orbits,
+          with a NaN pair between segments; X-Track-Start and X-Track-End give
+          the time span.
+    responses:
+      200:
+        description: >
+          Orbits in time order, each split at the antimeridian into segments
+          that end on the +/-180 meridian.
+      304:
+        description: Track unchanged since the ETag sent in If-None-Match
+      400:
+        description: Invalid before, after or format
+      503:
+        description: No TLE file available
+    """
+    before = request.args.get("before", 1, type=int)
+    after = request.args.get("after", 1, type=int)
+    fmt = request.args.get("format", "polyline")
+    if not 0 <= before <= TRACK_MAX_ORBITS or not 0 <= after <= TRACK_MAX_ORBITS:
+        return jsonify({"error": f"before and after must be between 0 and {TRACK_MAX_ORBITS}"}), 400
+    if fmt not in TRACK_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(TRACK_FORMATS)}"}), 400
+
+    # NumPy and SGP4 load on first use, keeping them off the app's startup path
+    from orbit import ground_track_cache, isoformat, TleUnavailable, GROUND_TRACK_STEP_SECONDS
+
+    try:
+        orbits, tle, current_ends = ground_track_cache.orbits(before, after)
+    except TleUnavailable as e:
+        return jsonify({"error": str(e)}), 503
+
+    if fmt == "float32":
+        nan_pair = b"\x00\x00\xc0\x7f" * 2
+        response = Response(nan_pair.join(orbit["float32"] for orbit in orbits), mimetype="application/octet-stream")
+        response.headers["X-Track-Start"] = isoformat(orbits[0]["start"])
+        response.headers["X-Track-End"] = isoformat(orbits[-1]["end"])
+    else:
+        response = jsonify({
+            "tle_epoch": isoformat(tle.epoch),
+            "step_seconds": GROUND_TRACK_STEP_SECONDS,
+            "orbits": [
+                {"start": isoformat(orbit["start"]), "end": isoformat(orbit["end"]), "segments": orbit["segments"]}
+                for orbit in orbits
+            ],
+        })
+
+    # The window only moves when the current orbit ends or the TLE changes
+    response.set_etag(f"{tle.epoch}-{orbits[0]['start']}-{before}-{after}-{fmt}")
+    response.cache_control.public = True
+    response.cache_control.max_age = max(0, math.floor(current_ends - time.time()))
+    return response.make_conditional(request)
@@ -0,0 +1,209 @@
+# Per-request timing, SQL counts and a Prometheus /metrics endpoint
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from flask import Response, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("snapstronaut.metrics")
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+# Raise instead of logging when a handler goes over its query budget (tests, local dev)
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "false").lower() == "true"
+# Upper bounds in seconds; +Inf is implied
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Raised in strict mode when a request runs more SQL than its route allows."""
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """
+    In-process metric store.
+
+    Recording is a dict lookup and a few additions under one lock, so it can
+    stay on for every request. Each worker process keeps its own numbers;
+    Prometheus sums them across scrape targets.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}
+        self.queries = {}
+        self.db_seconds = {}
+        self.slow_queries = 0
+        self.budget_exceeded = {}
+
+    def record_request(self, method, route, status, seconds, queries, db_seconds):
+        with self._lock:
+            key = (method, route, status)
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(seconds)
+
+            histogram = self.queries.get((method, route))
+            if histogram is None:
+                histogram = self.queries[(method, route)] = Histogram(QUERY_COUNT_BUCKETS)
+            histogram.observe(queries)
+            self.db_seconds[(method, route)] = self.db_seconds.get((method, route), 0.0) + db_seconds
+
+    def record_slow_query(self):
+        with self._lock:
+            self.slow_queries += 1
+
+    def record_budget_exceeded(self, method, route):
+        with self._lock:
+            self.budget_exceeded[(method, route)] = self.budget_exceeded.get((method, route), 0) + 1
+
+    def render(self):
+        """Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            lines += _render_histogram(
+                "http_request_duration_seconds", "Request latency by route",
+                ("method", "route", "status"), self.latency)
+            lines += _render_histogram(
+                "http_request_db_queries", "SQL statements executed per request",
+                ("method", "route"), self.queries)
+            lines.append("# HELP http_request_db_seconds_total Time spent in SQL statements")
+            lines.append("# TYPE http_request_db_seconds_total counter")
+            for (method, route), seconds in sorted(self.db_seconds.items()):
+                lines.append(f'http_request_db_seconds_total{{method="{method}",route="{route}"}} {seconds}')
+            lines.append("# HELP db_slow_queries_total SQL statements slower than SLOW_QUERY_MS")
+            lines.append("# TYPE db_slow_queries_total counter")
+            lines.append(f"db_slow_queries_total {self.slow_queries}")
+            lines.append("# HELP http_request_query_budget_exceeded_total Requests that ran more SQL than their route's budget")
+            lines.append("# TYPE http_request_query_budget_exceeded_total counter")
+            for key, count in sorted(self.budget_exceeded.items()):
+                lines.append(f'http_request_query_budget_exceeded_total{{{_labels(("method", "route"), key)}}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+def _labels(names, values):
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+def _render_histogram(name, help_text, label_names, histograms):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for key, histogram in sorted(histograms.items()):
+        labels = _labels(label_names, key)
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+metrics = Metrics()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    if has_app_context() and "request_started" in g:
+        g.request_queries += 1
+        g.request_db_seconds += elapsed
+        budget = g.get("query_budget")
+        if budget is not None and g.request_queries > budget:
+            _budget_exceeded(budget, statement)
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        metrics.record_slow_query()
+        logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, statement)
+
+
+@event.listens_for(Engine, "handle_error")
+def _query_failed(context):
+    # after_cursor_execute never fires for a failed statement
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+def _budget_exceeded(budget, statement):
+    # Report each request once, at the first statement over the limit: with an
+    # N+1 loop that statement is the one being repeated
+    if g.get("query_budget_reported"):
+        return
+    g.query_budget_reported = True
+    metrics.record_budget_exceeded(request.method, _route())
+    message = f"{request.method} {_route()} ran more than {budget} SQL statements; next was: {statement}"
+    if QUERY_BUDGET_STRICT:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+def query_budget(max_queries):
+    """
+    Declare how many SQL statements a route handler may run per request.
+
+    Going over is logged and counted on /metrics, or raises
+    QueryBudgetExceeded when QUERY_BUDGET_STRICT is set. The count covers the
+    whole request, including rows fetched while streaming a response.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            g.query_budget = max_queries
+            return fn(*args, **kwargs)
+        # Outer decorators' functools.wraps carry this up to the registered view
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorator
+
+
+def init_metrics(app):
+    """Time every request and expose the numbers on /metrics."""
+
+    @app.before_request
+    def _start_timer():
+        g.request_started = time.perf_counter()
+        g.request_queries = 0
+        g.request_db_seconds = 0.0
+
+    @app.after_request
+    def _record_request(response):
+        if "request_started" in g:
+            metrics.record_request(
+                request.method, _route(), response.status_code,
+                time.perf_counter() - g.request_started,
+                g.request_queries, g.request_db_seconds,
+            )
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def prometheus_metrics():
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,279 @@
+"""
+Versioned schema migrations for a live database.
+
+Unlike initdb.py this never drops anything: each migration runs once, in
+order, and is recorded in the schema_migrations table.
+
+    python migrate.py            # apply pending migrations
+    python migrate.py status     # list applied and pending migrations
+    python migrate.py check      # report expected indexes missing from the live DB
+"""
+import os
+import sys
+import psycopg2
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+
+# Highest number in an existing TEAMn join_id
+MAX_TEAM_JOIN_NUMBER = (
+    "(SELECT COALESCE(MAX(substring(join_id from 5)::int), 0) "
+    "FROM Teams WHERE join_id ~ '^TEAM[0-9]+$')"
+)
+
+
+class Migration:
+    def __init__(self, version, description, statements, transactional=True):
+        self.version = version
+        self.description = description
+        self.statements = statements
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+        self.transactional = transactional
+
+
+MIGRATIONS = [
+    Migration(1, "Materialized team and user point totals", [
+        """
+        CREATE TABLE IF NOT EXISTS TeamPoints (
+            team_id INT PRIMARY KEY REFERENCES Teams(team_id) ON DELETE CASCADE,
+            total_points INT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """,
+        """
+        INSERT INTO TeamPoints (team_id, total_points)
+        SELECT t.team_id, COALESCE(SUM(k.points), 0)
+        FROM Teams t
+        LEFT JOIN Users u ON u.team_id = t.team_id
+        LEFT JOIN UserTasks ut ON ut.user_id = u.user_id
+        LEFT JOIN Tasks k ON k.task_id = ut.task_id
+        GROUP BY t.team_id
+        ON CONFLICT (team_id) DO NOTHING;
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS UserPoints (
+            user_id INT PRIMARY KEY REFERENCES Users(user_id) ON DELETE CASCADE,
+            total_points INT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """,
+        """
+        INSERT INTO UserPoints (user_id, total_points)
+        SELECT u.user_id, COALESCE(SUM(k.points), 0)
+        FROM Users u
+        LEFT JOIN UserTasks ut ON ut.user_id = u.user_id
+        LEFT JOIN Tasks k ON k.task_id = ut.task_id
+        GROUP BY u.user_id
+        ON CONFLICT (user_id) DO NOTHING;
+        """,
+    ]),
+    Migration(2, "Indexes for the feed, not-completed, leaderboard and team queries", [
+        # Recent feed and its (completed_at, user_task_id) cursor
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_usertasks_completed_at "
+        "ON UserTasks (completed_at DESC, user_task_id DESC);",
+        # Per-user completed-task lookups
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_usertasks_user_task "
+        "ON UserTasks (user_id, task_id);",
+        # Foreign key side of Tasks deletes and per-task aggregations
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_usertasks_task_id "
+        "ON UserTasks (task_id);",
+        # Team rosters and team aggregation
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_team_id "
+        "ON Users (team_id);",
+        # Individual leaderboard top-k and rank counts
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_userpoints_rank "
+        "ON UserPoints (total_points DESC, user_id);",
+    ], transactional=False),
+    Migration(3, "Idempotency key column on UserTasks", [
+        "ALTER TABLE UserTasks ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(64);",
+    ]),
+    Migration(4, "Unique index on (user_id, idempotency_key)", [
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ux_usertasks_idempotency "
+        "ON UserTasks (user_id, idempotency_key) WHERE idempotency_key IS NOT NULL;",
+    ], transactional=False),
+    Migration(5, "Sequence for team join_id", [
+        "CREATE SEQUENCE IF NOT EXISTS teams_join_seq;",
+        # Continue past the highest old COUNT(*)-based join id; deleted teams
+        # mean the count can be lower than ids already handed out
+        f"SELECT setval('teams_join_seq', GREATEST({MAX_TEAM_JOIN_NUMBER}, 1));",
+    ]),
+    Migration(6, "Photo variant URLs on UserTasks", [
+        "ALTER TABLE UserTasks ADD COLUMN IF NOT EXISTS photo_variants JSONB;",
+    ]),
+    Migration(7, "Index of completions still waiting for photo variants", [
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_usertasks_photo_pending "
+        "ON UserTasks (user_task_id) WHERE photo_variants IS NULL;",
+    ], transactional=False),
+    Migration(8, "Per-score user counts for leaderboard ranks", [
+        """
+        CREATE TABLE IF NOT EXISTS UserPointCounts (
+            total_points INT PRIMARY KEY,
+            users INT NOT NULL DEFAULT 0
+        );
+        """,
+        # Scores only go up outside a rebuild, so concurrent completions lock
+        # buckets in ascending order and cannot deadlock on them
+        """
+        CREATE OR REPLACE FUNCTION userpoints_count_scores() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE UserPointCounts SET users = users - 1 WHERE total_points = OLD.total_points;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO UserPointCounts (total_points, users) VALUES (NEW.total_points, 1)
+                ON CONFLICT (total_points) DO UPDATE SET users = UserPointCounts.users + 1;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """,
+        "DROP TRIGGER IF EXISTS userpoints_count_scores ON UserPoints;",
+        """
+        CREATE TRIGGER userpoints_count_scores
+        AFTER INSERT OR DELETE OR UPDATE OF total_points ON UserPoints
+        FOR EACH ROW EXECUTE FUNCTION userpoints_count_scores();
+        """,
+        # The trigger's lock on UserPoints holds writers off until the counts below commit
+        "DELETE FROM UserPointCounts;",
+        """
+        INSERT INTO UserPointCounts (total_points, users)
+        SELECT total_points, COUNT(*) FROM UserPoints GROUP BY total_points;
+        """,
+    ]),
+    Migration(9, "Move teams_join_seq past every existing join_id", [
+        # Databases that ran migration 5 before it accounted for deleted teams
+        "SELECT setval('teams_join_seq', GREATEST("
+        f"{MAX_TEAM_JOIN_NUMBER}, (SELECT last_value FROM teams_join_seq), 1));",
+    ]),
+    Migration(10, "Photo worker retry state on UserTasks", [
+        "ALTER TABLE UserTasks ADD COLUMN IF NOT EXISTS photo_attempts SMALLINT NOT NULL DEFAULT 0;",
+        "ALTER TABLE UserTasks ADD COLUMN IF NOT EXISTS photo_retry_at TIMESTAMP;",
+    ]),
+]
+
+# (table, index) pairs the application's hot paths rely on
+EXPECTED_INDEXES = [
+    ("usertasks", "ix_usertasks_completed_at"),
+    ("usertasks", "ix_usertasks_user_task"),
+    ("usertasks", "ix_usertasks_task_id"),
+    ("users", "ix_users_team_id"),
+    ("userpoints", "ix_userpoints_rank"),
+    ("usertasks", "ux_usertasks_idempotency"),
+    ("usertasks", "ix_usertasks_photo_pending"),
+]
+
+
+def connect():
+    return psycopg2.connect(
+        host=os.getenv("DB_HOST"),
+        port=os.getenv("DB_PORT"),
+        database=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD")
+    )
+
+
+def ensure_migrations_table(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """)
+    connection.commit()
+
+
+def applied_versions(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT version FROM schema_migrations;")
+        versions = {row[0] for row in cursor.fetchall()}
+    # End the read's transaction; apply_migration cannot switch autocommit inside one
+    connection.commit()
+    return versions
+
+
+def apply_migration(connection, migration):
+    # psycopg2 only allows changing autocommit outside a transaction
+    connection.commit()
+    connection.autocommit = not migration.transactional
+    try:
+        with connection.cursor() as cursor:
+            for statement in migration.statements:
+                cursor.execute(statement)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, description) VALUES (%s, %s);",
+                (migration.version, migration.description)
+            )
+        if migration.transactional:
+            connection.commit()
+    except Exception:
+        if migration.transactional:
+            connection.rollback()
+        raise
+    finally:
+        connection.autocommit = False
+
+
+def upgrade(connection):
+    ensure_migrations_table(connection)
+    done = applied_versions(connection)
+    pending = [m for m in MIGRATIONS if m.version not in done]
+    if not pending:
+        print("Database is up to date.")
+    for migration in pending:
+        print(f"Applying {migration.version}: {migration.description}")
+        apply_migration(connection, migration)
+    return pending
+
+
+def status(connection):
+    ensure_migrations_table(connection)
+    done = applied_versions(connection)
+    for migration in MIGRATIONS:
+        state = "applied" if migration.version in done else "pending"
+        print(f"{migration.version:>4}  {state:<8} {migration.description}")
+
+
+def missing_indexes(connection):
+    """Return the EXPECTED_INDEXES that the live database does not have (or has invalid)."""
+    with connection.cursor() as cursor:
+        cursor.execute("""
+        SELECT c.relname
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = current_schema() AND i.indisvalid;
+        """)
+        present = {row[0] for row in cursor.fetchall()}
+    return [(table, index) for table, index in EXPECTED_INDEXES if index not in present]
+
+
+def check(connection):
+    missing = missing_indexes(connection)
+    for table, index in missing:
+        print(f"Missing index {index} on {table}")
+    if not missing:
+        print("All expected indexes are present.")
+    return not missing
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    connection = connect()
+    try:
+        if command == "upgrade":
+            upgrade(connection)
+        elif command == "status":
+            status(connection)
+        elif command == "check":
+            if not check(connection):
+                sys.exit(1)
+        else:
+            print(__doc__)
+            sys.exit(2)
+    finally:
+        connection.close()
@@ -1,7 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 import uuid
 
 db = SQLAlchemy()
@@ -39,6 +39,9 @@ class Teams(db.Model):
     # Relationship to Users
     members = relationship('User', back_populates='team', cascade="all, delete-orphan")
 
+    # Relationship to the materialized point total
+    points = relationship('TeamPoints', back_populates='team', uselist=False, cascade="all, delete-orphan")
+
     def to_dict(self):
         return {
             "team_id": self.team_id,
@@ -47,14 +50,67 @@ class Teams(db.Model):
         }
 
 
+class TeamPoints(db.Model):
+    __tablename__ = 'teampoints'
+
+    team_id = db.Column(db.Integer, db.ForeignKey('teams.team_id', ondelete='CASCADE'), primary_key=True)
+    total_points = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationship to Teams
+    team = relationship('Teams', back_populates='points')
+
+    def to_dict(self):
+        return {
+            "team_id": self.team_id,
+            "total_points": self.total_points,
+            "updated_at": self.updated_at.strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+
+class UserPoints(db.Model):
+    __tablename__ = 'userpoints'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete='CASCADE'), primary_key=True)
+    total_points = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationship to Users
+    user = relationship('User', back_populates='points')
+
+    def to_dict(self):
+        return {
+            "user_id": self.user_id,
+            "total_points": self.total_points,
+            "updated_at": self.updated_at.strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+# Serves top-k reads and neighbour scans without touching the heap
+db.Index('ix_userpoints_rank', UserPoints.total_points.desc(), UserPoints.user_id)
+
+
+class UserPointCounts(db.Model):
+    """How many users hold each point total; kept in step with UserPoints by a trigger (migrate.py)."""
+    __tablename__ = 'userpointcounts'
+
+    total_points = db.Column(db.Integer, primary_key=True)
+    users = db.Column(db.Integer, nullable=False, default=0)
+
+
 class UserTasks(db.Model):
     __tablename__ = 'usertasks'
     
     user_task_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
-    task_id = db.Column(db.Integer, db.ForeignKey('tasks.task_id'), nullable=False)
+    task_id = db.Column(db.Integer, db.ForeignKey('tasks.task_id'), nullable=False, index=True)
     photo_url = db.Column(db.String(255))
     completed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    idempotency_key = db.Column(db.String(64))
+    # Variant name -> URL, filled in by the photo worker; {} when none could be made
+    photo_variants = db.Column(JSONB)
+    # Store failures so far, and when the photo worker may try again
+    photo_attempts = db.Column(db.SmallInteger, nullable=False, default=0, server_default='0')
+    photo_retry_at = db.Column(db.DateTime)
     
     # Relationships to Users and Tasks
     user = relationship('User', back_populates='tasks')
@@ -69,6 +125,14 @@ class UserTasks(db.Model):
             "completed_at": self.completed_at.strftime("%Y-%m-%d %H:%M:%S")
         }
 
+# Keep in step with the indexes created by migrate.py
+db.Index('ix_usertasks_completed_at', UserTasks.completed_at.desc(), UserTasks.user_task_id.desc())
+db.Index('ix_usertasks_user_task', UserTasks.user_id, UserTasks.task_id)
+db.Index('ux_usertasks_idempotency', UserTasks.user_id, UserTasks.idempotency_key, unique=True,
+         postgresql_where=UserTasks.idempotency_key.isnot(None))
+db.Index('ix_usertasks_photo_pending', UserTasks.user_task_id,
+         postgresql_where=UserTasks.photo_variants.is_(None))
+
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -77,12 +141,13 @@ class User(db.Model):
     username = db.Column(db.String(50), unique=True, nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=False)
     password = db.Column(db.String(255), nullable=False)
-    team_id = db.Column(db.Integer, db.ForeignKey('teams.team_id'))
+    team_id = db.Column(db.Integer, db.ForeignKey('teams.team_id'), index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships to Teams and UserTasks
     team = relationship('Teams', back_populates='members')
     tasks = relationship('UserTasks', back_populates='user', cascade="all, delete-orphan")
+    points = relationship('UserPoints', back_populates='user', uselist=False, cascade="all, delete-orphan")
 
     def to_dict(self):
         return {
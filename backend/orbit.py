@@ -0,0 +1,475 @@
+# Offline ISS orbit propagation (SGP4) and vectorized pass prediction
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+from functools import lru_cache
+import numpy as np
+from sgp4.api import Satrec
+
+ISS_TLE_PATH = os.getenv("ISS_TLE_PATH", os.path.join(os.path.dirname(__file__), "data", "iss.tle"))
+# How often the TLE file's mtime is checked for updates
+TLE_CHECK_SECONDS = 60
+# Predictions drift by kilometres per day away from the element set's epoch
+TLE_MAX_AGE_DAYS = 14
+
+PASS_STEP_SECONDS = 30
+PASS_MIN_ELEVATION_DEG = 10.0
+# Screening runs every PASS_COARSE_FACTOR samples
+PASS_COARSE_FACTOR = 4
+# Golden-section steps refining the culmination between samples (about 1e-5 of a step)
+PEAK_SEARCH_ITERATIONS = 24
+# Ground-track speed bound: orbital motion plus Earth rotation, for low orbits
+PASS_MAX_ANGULAR_RATE_DEG = 0.075
+# Locations are snapped to cells this size; pass times barely move within one
+PASS_GRID_DEG = 0.1
+PASS_CACHE_MAX_ENTRIES = 4096
+# Sites evaluated together; bounds the (sites x samples) working arrays
+PASS_SITE_CHUNK = 256
+
+GROUND_TRACK_STEP_SECONDS = 30
+# Decimal places kept by the polyline encoding (5 is about a metre)
+GROUND_TRACK_PRECISION = 5
+GROUND_TRACK_CACHE_MAX_ENTRIES = 64
+
+JULIAN_UNIX_EPOCH = 2440587.5
+WGS84_A_KM = 6378.137
+WGS84_F = 1 / 298.257223563
+WGS84_E2 = WGS84_F * (2 - WGS84_F)
+
+Tle = namedtuple("Tle", ["name", "line1", "line2", "satrec", "epoch"])
+
+
+class TleUnavailable(RuntimeError):
+    """Raised when the TLE file is missing or unreadable."""
+
+
+def parse_tle(text):
+    """Parse a two- or three-line element set; the name line is optional."""
+    lines = [line.rstrip() for line in text.splitlines() if line.strip()]
+    line1 = next((line for line in lines if line.startswith("1 ")), None)
+    line2 = next((line for line in lines if line.startswith("2 ")), None)
+    if line1 is None or line2 is None:
+        raise TleUnavailable("TLE file must contain element lines 1 and 2")
+    name = lines[0] if not lines[0].startswith("1 ") else "ISS"
+    satrec = Satrec.twoline2rv(line1, line2)
+    epoch = (satrec.jdsatepoch - JULIAN_UNIX_EPOCH + satrec.jdsatepochF) * 86400
+    return Tle(name, line1, line2, satrec, epoch)
+
+
+class TleStore:
+    """
+    The current element set, reloaded when the file on disk changes.
+
+    Updating the TLE is a file replace (for example a daily cron download);
+    nothing in the request path touches the network.
+    """
+
+    def __init__(self, path=ISS_TLE_PATH, check_seconds=TLE_CHECK_SECONDS):
+        self.path = path
+        self._check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._tle = None
+        self._mtime = None
+        self._checked_at = 0.0
+
+    def current(self):
+        now = time.monotonic()
+        if self._tle is not None and now - self._checked_at < self._check_seconds:
+            return self._tle
+        with self._lock:
+            if self._tle is None or now - self._checked_at >= self._check_seconds:
+                try:
+                    mtime = os.stat(self.path).st_mtime
+                    if mtime != self._mtime:
+                        with open(self.path) as f:
+                            self._tle = parse_tle(f.read())
+                        self._mtime = mtime
+                except OSError as e:
+                    if self._tle is None:
+                        raise TleUnavailable(f"Cannot read TLE file {self.path}: {e}") from e
+                self._checked_at = now
+        return self._tle
+
+
+def _julian(unix_times):
+    days = unix_times / 86400
+    whole = np.floor(days)
+    return JULIAN_UNIX_EPOCH + whole, days - whole
+
+
+def _gmst(jd, fr):
+    """Greenwich mean sidereal angle in radians (IAU 1982)."""
+    t = (jd - 2451545.0 + fr) / 36525
+    seconds = 67310.54841 + (876600 * 3600 + 8640184.812866) * t + 0.093104 * t ** 2 - 6.2e-6 * t ** 3
+    return np.radians((seconds % 86400) / 240)
+
+
+def propagate_ecef(tle, unix_times):
+    """
+    Satellite positions in km, Earth-fixed, for every time in ``unix_times``.
+
+    One vectorized SGP4 call followed by a rotation from TEME by GMST (polar
+    motion is ignored, well under a kilometre). Returns ``(positions, ok)``
+    where ``ok`` masks samples SGP4 could not propagate.
+    """
+    jd, fr = _julian(np.asarray(unix_times, dtype=float))
+    errors, teme, _ = tle.satrec.sgp4_array(jd, fr)
+    theta = _gmst(jd, fr)
+    cos_t, sin_t = np.cos(theta), np.sin(theta)
+    ecef = np.empty_like(teme)
+    ecef[:, 0] = cos_t * teme[:, 0] + sin_t * teme[:, 1]
+    ecef[:, 1] = -sin_t * teme[:, 0] + cos_t * teme[:, 1]
+    ecef[:, 2] = teme[:, 2]
+    return ecef, errors == 0
+
+
+@lru_cache(maxsize=16)
+def _sample_orbit(tle, start, days, step):
+    """
+    Sample times, ECEF positions, validity and squared radii for a window.
+
+    Shared by every request for the same window, so single-location cache
+    misses skip propagation. The arrays are read-only.
+    """
+    times = start + np.arange(0, days * 86400 + step, step, dtype=float)
+    sat, ok = propagate_ecef(tle, times)
+    sat_sq = np.einsum("ij,ij->i", sat, sat)
+    for array in (times, sat, ok, sat_sq):
+        array.setflags(write=False)
+    return times, sat, ok, sat_sq
+
+
+def _site_frames(lats, lngs):
+    """ECEF positions (km) and local east/north/up unit vectors for sea-level sites."""
+    lat, lng = np.radians(lats), np.radians(lngs)
+    sin_lat, cos_lat = np.sin(lat), np.cos(lat)
+    sin_lng, cos_lng = np.sin(lng), np.cos(lng)
+    n = WGS84_A_KM / np.sqrt(1 - WGS84_E2 * sin_lat ** 2)
+    position = np.stack([n * cos_lat * cos_lng, n * cos_lat * sin_lng, n * (1 - WGS84_E2) * sin_lat], axis=1)
+    east = np.stack([-sin_lng, cos_lng, np.zeros_like(lat)], axis=1)
+    north = np.stack([-sin_lat * cos_lng, -sin_lat * sin_lng, cos_lat], axis=1)
+    up = np.stack([cos_lat * cos_lng, cos_lat * sin_lng, sin_lat], axis=1)
+    return position, east, north, up
+
+
+def _visibility_radius(sat, min_elevation):
+    """
+    Largest Earth-central angle (radians) between a site and the satellite at
+    which it can be ``min_elevation`` above the horizon.
+    """
+    r_max = float(np.max(np.linalg.norm(sat, axis=1)))
+    el = np.radians(min_elevation)
+    return float(np.arccos(min(1.0, WGS84_A_KM / r_max * np.cos(el))) - el)
+
+
+def predict_passes(tle, lats, lngs, start, days, min_elevation=PASS_MIN_ELEVATION_DEG,
+                   step=PASS_STEP_SECONDS):
+    """
+    Overflight windows for many ground sites at once.
+
+    The orbit is propagated once for the whole window. A coarse screen (one
+    matrix product of site and satellite directions every PASS_COARSE_FACTOR
+    samples) finds the few per cent of (site, time) pairs where the station
+    is near enough to be visible; elevations are then computed only in those
+    windows, all windows in one array. Rise and set times are interpolated
+    between samples. Passes already in progress at ``start`` or unfinished at
+    the end are left out. Returns one list of pass dicts per site, with unix
+    times and degrees.
+    """
+    times, sat, ok, sat_sq = _sample_orbit(tle, start, days, step)
+    sin_min = np.sin(np.radians(min_elevation))
+    factor = PASS_COARSE_FACTOR
+    coarse = sat[::factor] / np.linalg.norm(sat[::factor], axis=1)[:, None]
+    # A fine sample is at most half a coarse step of ground-track motion from a coarse one
+    half_step = np.radians(PASS_MAX_ANGULAR_RATE_DEG * step * factor / 2)
+    cos_screen = np.cos(_visibility_radius(sat[ok], min_elevation) + half_step + np.radians(1))
+
+    positions, easts, norths, ups = _site_frames(np.asarray(lats, float), np.asarray(lngs, float))
+    directions = positions / np.linalg.norm(positions, axis=1)[:, None]
+    results = []
+    for lo in range(0, len(positions), PASS_SITE_CHUNK):
+        site, up = positions[lo:lo + PASS_SITE_CHUNK], ups[lo:lo + PASS_SITE_CHUNK]
+        east, north = easts[lo:lo + PASS_SITE_CHUNK], norths[lo:lo + PASS_SITE_CHUNK]
+        site_up = np.einsum("ij,ij->i", site, up)
+        site_sq = np.einsum("ij,ij->i", site, site)
+
+        # Runs of coarse samples where the station is close; padded so every run has both ends
+        near = np.zeros((len(site), len(coarse) + 2), dtype=bool)
+        np.greater(directions[lo:lo + PASS_SITE_CHUNK] @ coarse.T, cos_screen, out=near[:, 1:-1])
+        rows, first_near = np.nonzero(near[:, 1:] & ~near[:, :-1])
+        _, end_near = np.nonzero(near[:, :-1] & ~near[:, 1:])
+
+        # Fine samples from one coarse step before the run to one after; those
+        # two bounds are out of view unless they fall off either end of the window
+        low = (first_near - 1) * factor
+        high = end_near * factor
+        width = int(np.max(high - low, initial=0)) + 1
+        cols = low[:, None] + np.arange(width)
+        valid = (cols >= 0) & (cols < len(times)) & (cols <= high[:, None])
+        cols = np.clip(cols, 0, len(times) - 1)
+        valid &= ok[cols]
+        # (sat - site) . up and |sat - site|^2 expanded, so only sat is gathered per sample
+        window_sat = sat[cols]
+        height = np.einsum("rwj,rj->rw", window_sat, up[rows]) - site_up[rows][:, None]
+        distance_sq = sat_sq[cols] - 2 * np.einsum("rwj,rj->rw", window_sat, site[rows]) + site_sq[rows][:, None]
+        sin_el = np.where(valid, height / np.sqrt(distance_sq), -1.0)
+
+        above = sin_el > sin_min
+        rise = np.argmax(above, axis=1)
+        last = width - 1 - np.argmax(above[:, ::-1], axis=1)
+        # Both neighbours of the pass must be real samples below the threshold
+        index = np.arange(len(rows))
+        complete = above.any(axis=1) & (rise > 0) & (last + 1 < width)
+        complete &= valid[index, np.maximum(rise - 1, 0)] & valid[index, np.minimum(last + 1, width - 1)]
+        rows, cols, sin_el, rise, last = rows[complete], cols[complete], sin_el[complete], rise[complete], last[complete]
+        height, distance_sq = height[complete], distance_sq[complete]
+        index = np.arange(len(rows))
+
+        margin = sin_el - sin_min
+        rise_time = _crossing(times, cols[index, rise - 1], margin[index, rise - 1], margin[index, rise])
+        set_time = _crossing(times, cols[index, last], margin[index, last], margin[index, last + 1])
+        peak = np.argmax(sin_el, axis=1)
+        around = peak[:, None] + np.arange(-1, 2)
+        peak_time, peak_sin_el = _refine_peak(
+            times[cols[index, peak]], step, height[index[:, None], around], distance_sq[index[:, None], around]
+        )
+        max_elevation = np.degrees(np.arcsin(np.clip(peak_sin_el, -1, 1)))
+        rise_azimuth = _azimuth(sat[cols[index, rise]], site[rows], east[rows], north[rows])
+        set_azimuth = _azimuth(sat[cols[index, last]], site[rows], east[rows], north[rows])
+
+        chunk = [[] for _ in range(len(site))]
+        for k, rise_at, peak_at, set_at, max_el, rise_az, set_az in zip(
+            rows.tolist(), rise_time.tolist(), peak_time.tolist(), set_time.tolist(),
+            np.round(max_elevation, 1).tolist(), np.round(rise_azimuth, 1).tolist(),
+            np.round(set_azimuth, 1).tolist(),
+        ):
+            chunk[k].append({
+                "rise": rise_at,
+                "culminate": peak_at,
+                "set": set_at,
+                "max_elevation": max_el,
+                "rise_azimuth": rise_az,
+                "set_azimuth": set_az,
+            })
+        results.extend(chunk)
+    return results
+
+
+def _refine_peak(peak_time, step, height, distance_sq):
+    """
+    Culmination time and sine of elevation between samples.
+
+    Height above the site's horizon plane and squared range are smooth, so
+    each is fitted with a parabola through the peak sample and its two
+    neighbours, and their ratio is maximised by golden-section search. The
+    elevation itself has a sharp crest on overhead passes, which sampling or
+    fitting it directly would cut off.
+    """
+    def fit(values, x):
+        # Parabola through samples at x = -1, 0, 1 (in steps from the peak sample)
+        return values[:, 1] + x * (values[:, 2] - values[:, 0]) / 2 \
+            + x * x * (values[:, 2] - 2 * values[:, 1] + values[:, 0]) / 2
+
+    def sin_el(x):
+        return fit(height, x) / np.sqrt(np.maximum(fit(distance_sq, x), 1e-9))
+
+    ratio = (math.sqrt(5) - 1) / 2
+    lo = np.full(len(peak_time), -1.0)
+    hi = np.full(len(peak_time), 1.0)
+    for _ in range(PEAK_SEARCH_ITERATIONS):
+        a = hi - ratio * (hi - lo)
+        b = lo + ratio * (hi - lo)
+        left = sin_el(a) > sin_el(b)
+        hi = np.where(left, b, hi)
+        lo = np.where(left, lo, a)
+    x = (lo + hi) / 2
+    return peak_time + x * step, sin_el(x)
+
+
+def _crossing(times, i, v0, v1):
+    """Times where a value going from v0 (sample i) to v1 (sample i + 1) crosses zero."""
+    return times[i] + (times[i + 1] - times[i]) * (v0 / (v0 - v1))
+
+
+def _azimuth(sat, site, east, north):
+    """Azimuths in degrees, clockwise from north, of ``sat`` seen from ``site`` (row-wise)."""
+    rel = sat - site
+    return np.degrees(np.arctan2(np.einsum("ij,ij->i", rel, east), np.einsum("ij,ij->i", rel, north))) % 360
+
+
+def grid_cell(lat, lng, size=PASS_GRID_DEG):
+    """Snap a location to the centre of its grid cell."""
+    # The poles and the antimeridian belong to the last row and column
+    row = min(math.floor((lat + 90) / size), math.ceil(180 / size) - 1)
+    col = min(math.floor((lng + 180) / size), math.ceil(360 / size) - 1)
+    return row, col, -90 + (row + 0.5) * size, -180 + (col + 0.5) * size
+
+
+class PassCache:
+    """
+    LRU of pass predictions keyed by grid cell, window and TLE epoch.
+
+    Windows start at UTC midnight, so one entry answers every request for
+    that cell all day; a new TLE changes the key and old entries age out.
+    """
+
+    def __init__(self, store, max_entries=PASS_CACHE_MAX_ENTRIES):
+        self.store = store
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def passes(self, lat, lng, days, now=None):
+        """Passes over (lat, lng) from ``now`` for ``days`` days, plus the TLE used."""
+        now = time.time() if now is None else now
+        tle = self.store.current()
+        row, col, cell_lat, cell_lng = grid_cell(lat, lng)
+        day_start = now - now % 86400
+        key = (tle.epoch, row, col, days, day_start)
+
+        with self._lock:
+            passes = self._entries.get(key)
+            if passes is not None:
+                self._entries.move_to_end(key)
+        if passes is None:
+            # Cover the tail of a window that starts late in the day
+            passes = predict_passes(tle, [cell_lat], [cell_lng], day_start, days + 1)[0]
+            with self._lock:
+                self._entries[key] = passes
+                if len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+
+        end = now + days * 86400
+        upcoming = [p for p in passes if p["set"] > now and p["rise"] < end]
+        return upcoming, tle, (cell_lat, cell_lng)
+
+
+def subpoints(ecef):
+    """Geodetic latitude and longitude (degrees) below ECEF positions in km."""
+    x, y, z = ecef[:, 0], ecef[:, 1], ecef[:, 2]
+    p = np.hypot(x, y)
+    lat = np.arctan2(z, p * (1 - WGS84_E2))
+    # Two fixed-point steps are well under a metre at orbital altitude
+    for _ in range(2):
+        n = WGS84_A_KM / np.sqrt(1 - WGS84_E2 * np.sin(lat) ** 2)
+        height = p / np.cos(lat) - n
+        lat = np.arctan2(z, p * (1 - WGS84_E2 * n / (n + height)))
+    return np.degrees(lat), np.degrees(np.arctan2(y, x))
+
+
+def split_antimeridian(lats, lngs):
+    """
+    Split a track into segments that never cross the +/-180 meridian.
+
+    Each crossing ends one segment and starts the next with a point on the
+    meridian itself, at the interpolated latitude, so drawn lines reach the
+    map edge instead of stopping short or wrapping across the whole map.
+    """
+    jumps = np.flatnonzero(np.abs(np.diff(lngs)) > 180)
+    segments = []
+    begin = 0
+    entry = None
+    for i in jumps:
+        edge = 180.0 if lngs[i] > 0 else -180.0
+        # Distance to the edge on this side over the true (wrapped) step
+        step = 360 - abs(lngs[i + 1] - lngs[i])
+        lat = lats[i] + (lats[i + 1] - lats[i]) * (abs(edge - lngs[i]) / step)
+        segment = np.column_stack([lats[begin:i + 1], lngs[begin:i + 1]])
+        if entry is not None:
+            segment = np.vstack([entry, segment])
+        segments.append(np.vstack([segment, [lat, edge]]))
+        entry = [lat, -edge]
+        begin = i + 1
+    segment = np.column_stack([lats[begin:], lngs[begin:]])
+    segments.append(segment if entry is None else np.vstack([entry, segment]))
+    return segments
+
+
+def encode_polyline(points, precision=GROUND_TRACK_PRECISION):
+    """Google encoded-polyline string for an (n, 2) array of lat/lng degrees."""
+    scaled = np.round(np.asarray(points) * 10 ** precision).astype(np.int64)
+    deltas = np.diff(scaled, axis=0, prepend=[[0, 0]]).ravel()
+    chunks = []
+    for value in ((deltas << 1) ^ (deltas >> 63)).tolist():
+        while value >= 0x20:
+            chunks.append(chr((0x20 | (value & 0x1F)) + 63))
+            value >>= 5
+        chunks.append(chr(value + 63))
+    return "".join(chunks)
+
+
+def orbital_period(tle):
+    """Seconds per revolution, from the element set's mean motion."""
+    return 2 * math.pi / tle.satrec.no_kozai * 60
+
+
+class GroundTrackCache:
+    """
+    Ground track of each revolution, computed once per TLE.
+
+    Revolutions are numbered by whole periods from the TLE epoch. Misses are
+    propagated together in one vectorized call, and each revolution is kept
+    already split at the antimeridian and encoded, so requests only join
+    cached pieces.
+    """
+
+    def __init__(self, store, max_entries=GROUND_TRACK_CACHE_MAX_ENTRIES):
+        self.store = store
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def orbits(self, before, after, now=None):
+        """The current revolution with ``before`` earlier and ``after`` later ones, plus the TLE."""
+        now = time.time() if now is None else now
+        tle = self.store.current()
+        period = orbital_period(tle)
+        current = math.floor((now - tle.epoch) / period)
+        numbers = range(current - before, current + after + 1)
+
+        with self._lock:
+            cached = {n: self._entries.get((tle.epoch, n)) for n in numbers}
+        missing = [n for n, orbit in cached.items() if orbit is None]
+        if missing:
+            cached.update(self._compute(tle, period, missing))
+        with self._lock:
+            for n in numbers:
+                self._entries[(tle.epoch, n)] = cached[n]
+                self._entries.move_to_end((tle.epoch, n))
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return [cached[n] for n in numbers], tle, tle.epoch + (current + 1) * period
+
+    def _compute(self, tle, period, numbers):
+        step = GROUND_TRACK_STEP_SECONDS
+        offsets = np.append(np.arange(0, period, step), period)
+        starts = tle.epoch + np.asarray(numbers, dtype=float) * period
+        ecef, ok = propagate_ecef(tle, (starts[:, None] + offsets).ravel())
+        lats, lngs = subpoints(ecef)
+        lats, lngs, ok = (a.reshape(len(numbers), len(offsets)) for a in (lats, lngs, ok))
+
+        computed = {}
+        for k, n in enumerate(numbers):
+            segments = split_antimeridian(lats[k][ok[k]], lngs[k][ok[k]])
+            computed[n] = {
+                "start": float(starts[k]),
+                "end": float(starts[k] + period),
+                "segments": [encode_polyline(segment) for segment in segments],
+                # float32 lat/lng pairs, segments separated by a NaN pair
+                "float32": np.vstack([
+                    part for segment in segments for part in (segment, [[np.nan, np.nan]])
+                ][:-1]).astype("<f4").tobytes(),
+            }
+        return computed
+
+
+def isoformat(unix_time):
+    return datetime.fromtimestamp(unix_time, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+tle_store = TleStore()
+pass_cache = PassCache(tle_store)
+ground_track_cache = GroundTrackCache(tle_store)
@@ -0,0 +1,107 @@
+# Keyset (cursor) pagination helpers shared by the list endpoints
+import base64
+from bisect import bisect_right
+import json
+from datetime import datetime
+from flask import request, jsonify
+from sqlalchemy import tuple_
+from sqlalchemy.engine import Row
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Header carrying the next cursor for endpoints whose body is a bare array
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class CursorError(ValueError):
+    """Raised when a client sends a cursor that cannot be decoded."""
+
+
+def encode_cursor(*values):
+    """Pack the sort key of the last row on a page into an opaque token."""
+    raw = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(raw).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, types):
+    """
+    Unpack a token produced by encode_cursor.
+
+    ``types`` holds one converter per key column, e.g. ``(datetime.fromisoformat, int)``.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(raw, list) or len(raw) != len(types):
+            raise CursorError("Malformed cursor")
+        return [convert(value) for convert, value in zip(types, raw)]
+    except CursorError:
+        raise
+    except (ValueError, TypeError) as e:
+        raise CursorError("Malformed cursor") from e
+
+
+def page_size(default=DEFAULT_PAGE_SIZE):
+    """Read ``limit`` from the query string, clamped to [1, MAX_PAGE_SIZE]."""
+    limit = request.args.get("limit", default, type=int)
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def paginate(query, columns, types, limit, descending=False):
+    """
+    Return one page of ``query`` ordered by ``columns`` and the next cursor.
+
+    The cursor comes from the ``cursor`` query parameter. Pages are selected
+    with a row comparison on the key columns, so every page costs an index
+    range scan of ``limit + 1`` rows however deep into the table it is.
+    """
+    key = tuple_(*columns) if len(columns) > 1 else columns[0]
+    token = request.args.get("cursor")
+    if token:
+        values = decode_cursor(token, types)
+        bound = tuple_(*values) if len(values) > 1 else values[0]
+        query = query.filter(key < bound if descending else key > bound)
+
+    order = [c.desc() if descending else c.asc() for c in columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(*_key_values(rows[-1], columns))
+    return rows, next_cursor
+
+
+def paginate_sorted(items, keys, limit):
+    """
+    Page through an in-memory list already sorted by the integer ``keys``.
+
+    Uses the same cursor format as paginate, so clients cannot tell whether a
+    page came from the database or a cache.
+    """
+    start = 0
+    token = request.args.get("cursor")
+    if token:
+        (after,) = decode_cursor(token, (int,))
+        start = bisect_right(keys, after)
+
+    page = items[start:start + limit]
+    next_cursor = None
+    if start + limit < len(items):
+        next_cursor = encode_cursor(keys[start + limit - 1])
+    return page, next_cursor
+
+
+def _key_values(row, columns):
+    # Rows are either ORM entities or result rows led by the entity
+    entity = row[0] if isinstance(row, Row) else row
+    return [getattr(entity, column.key) for column in columns]
+
+
+def array_response(items, next_cursor):
+    """jsonify a bare array, advertising the next page in a response header."""
+    response = jsonify(items)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return response
@@ -0,0 +1,91 @@
+# Password hashing off the request threads, with tunable algorithm and cost
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Any werkzeug method string, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000"
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+# "thread" relies on hashlib releasing the GIL; "process" isolates hashing fully
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+# Requests waiting for a worker beyond this are turned away instead of queueing
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", PASSWORD_HASH_WORKERS * 8))
+PASSWORD_HASH_WAIT_SECONDS = float(os.getenv("PASSWORD_HASH_WAIT_SECONDS", 2))
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when the hashing pool is saturated; callers should answer 503."""
+
+
+class PasswordHasher:
+    """
+    Bounded pool that runs the deliberately slow hash functions.
+
+    At most ``workers`` hashes run at once, so a burst of logins cannot take
+    every CPU away from the other endpoints, and at most ``queue`` requests
+    wait for a slot.
+    """
+
+    def __init__(self, method=PASSWORD_HASH_METHOD, executor=PASSWORD_HASH_EXECUTOR,
+                 workers=PASSWORD_HASH_WORKERS, queue=PASSWORD_HASH_QUEUE,
+                 wait_seconds=PASSWORD_HASH_WAIT_SECONDS):
+        self.method = method
+        self._executor_kind = executor
+        self._workers = workers
+        self._wait_seconds = wait_seconds
+        self._slots = threading.BoundedSemaphore(workers + queue)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._stored_method = None
+
+    def _get_pool(self):
+        # Started on first use so that importing the app stays cheap
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    executor = ProcessPoolExecutor if self._executor_kind == "process" else ThreadPoolExecutor
+                    self._pool = executor(max_workers=self._workers)
+        return self._pool
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self._wait_seconds):
+            raise PasswordHasherBusy("Too many concurrent logins, retry shortly")
+        try:
+            return self._get_pool().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def hash_many(self, passwords):
+        """
+        Hash a batch across the whole pool, for bulk imports.
+
+        Bypasses the per-request queue limit: the caller is a single admin
+        job that wants every worker, not an interactive request.
+        """
+        pool = self._get_pool()
+        return list(pool.map(generate_password_hash, passwords, [self.method] * len(passwords)))
+
+    def verify(self, stored_hash, password):
+        return self._run(check_password_hash, stored_hash, password)
+
+    def stored_method(self):
+        """
+        The method prefix werkzeug writes for ``self.method``.
+
+        werkzeug fills in defaults, so "scrypt" is stored as "scrypt:32768:8:1".
+        Hashing once is the only way to learn the expanded form; it is cached.
+        """
+        if self._stored_method is None:
+            self._stored_method = generate_password_hash("", self.method).split("$", 1)[0]
+        return self._stored_method
+
+    def needs_rehash(self, stored_hash):
+        """True when ``stored_hash`` was made with a different method or cost."""
+        return stored_hash.split("$", 1)[0] != self.stored_method()
+
+
+password_hasher = PasswordHasher()
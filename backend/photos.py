@@ -0,0 +1,295 @@
+# Resized WebP/JPEG variants of completion photos, rendered off the request path
+import io
+import logging
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "s3" reads and writes the photo bucket; "local" uses a directory, for offline runs
+PHOTO_STORE = os.getenv("PHOTO_STORE", "s3")
+PHOTO_LOCAL_ROOT = os.getenv("PHOTO_LOCAL_ROOT", "photos")
+PHOTO_LOCAL_URL = os.getenv("PHOTO_LOCAL_URL", "http://localhost:5000/photos")
+PHOTO_PROCESSES = int(os.getenv("PHOTO_PROCESSES", os.cpu_count() or 1))
+PHOTO_BATCH_SIZE = 50
+# How often the worker looks for completions it did not hear about on the event feed
+PHOTO_SWEEP_SECONDS = 60
+# Photos failing with store errors are retried after 1, 2, 4, ... minutes (at most
+# PHOTO_RETRY_MAX_MINUTES apart), then given up on after PHOTO_MAX_ATTEMPTS
+PHOTO_MAX_ATTEMPTS = 10
+PHOTO_RETRY_MAX_MINUTES = 360
+# Larger images are rejected rather than decoded
+PHOTO_MAX_PIXELS = 100_000_000
+
+# (name, longest side in pixels, format), largest first so each is resized from the previous
+PHOTO_VARIANTS = (
+    ("large", 1280, "WEBP"),
+    ("thumb", 320, "WEBP"),
+    ("thumb_jpeg", 320, "JPEG"),
+)
+FORMAT_OPTIONS = {
+    "WEBP": {"extension": "webp", "content_type": "image/webp", "quality": 80, "method": 4},
+    "JPEG": {"extension": "jpg", "content_type": "image/jpeg", "quality": 82, "optimize": True, "progressive": True},
+}
+VARIANT_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+logger = logging.getLogger("snapstronaut.photos")
+
+
+class PhotoMissing(LookupError):
+    """Raised by a store when the original photo does not exist."""
+
+
+def key_for_url(photo_url, base_url):
+    """Object key of a stored photo URL: the part after ``base_url``, else after the host."""
+    if photo_url.startswith(base_url + "/"):
+        return photo_url[len(base_url) + 1:]
+    parts = photo_url.split("/", 3)
+    return parts[3] if len(parts) == 4 and "://" in photo_url else photo_url
+
+
+def variant_key(key, name, fmt):
+    return f"variants/{key}/{name}.{FORMAT_OPTIONS[fmt]['extension']}"
+
+
+def render_variants(data):
+    """
+    Decode one photo and encode every variant; returns ``{name: bytes}``.
+
+    Runs in a worker process. JPEGs are decoded at a reduced DCT scale close
+    to the largest variant, which is most of the saving on camera photos.
+    """
+    from PIL import Image, ImageOps
+
+    largest = PHOTO_VARIANTS[0][1]
+    variants = {}
+    with Image.open(io.BytesIO(data)) as original:
+        if original.width * original.height > PHOTO_MAX_PIXELS:
+            raise ValueError(f"{original.width}x{original.height} image is too large")
+        original.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(original).convert("RGB")
+    for name, size, fmt in PHOTO_VARIANTS:
+        # Never upscales; a no-op when the image is already small enough
+        image.thumbnail((size, size), Image.LANCZOS)
+        options = {k: v for k, v in FORMAT_OPTIONS[fmt].items() if k not in ("extension", "content_type")}
+        buffer = io.BytesIO()
+        image.save(buffer, fmt, **options)
+        variants[name] = buffer.getvalue()
+    return variants
+
+
+class LocalStore:
+    """Photos as files under ``root``, served from ``base_url``."""
+
+    def __init__(self, root=PHOTO_LOCAL_ROOT, base_url=PHOTO_LOCAL_URL):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+
+    def _path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise PhotoMissing(key)
+        return path
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise PhotoMissing(key)
+
+    def put(self, key, data, content_type):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Readers never see a half-written file
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def url(self, key):
+        return f"{self.base_url}/{key}"
+
+
+class S3Store:
+    """Photos in an S3 bucket; pass a moto or MinIO client to run offline."""
+
+    def __init__(self, client=None, bucket=None):
+        from uploads import get_s3_client, S3_BUCKET_NAME
+
+        self.client = client or get_s3_client()
+        self.bucket = bucket or S3_BUCKET_NAME
+        self.base_url = f"https://{self.bucket}.s3.amazonaws.com"
+
+    def get(self, key):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+        except self.client.exceptions.NoSuchKey:
+            raise PhotoMissing(key)
+
+    def put(self, key, data, content_type):
+        self.client.put_object(
+            Bucket=self.bucket, Key=key, Body=data,
+            ContentType=content_type, CacheControl=VARIANT_CACHE_CONTROL,
+        )
+
+    def url(self, key):
+        return f"{self.base_url}/{key}"
+
+
+def default_store():
+    return LocalStore() if PHOTO_STORE == "local" else S3Store()
+
+
+class PhotoPipeline:
+    """
+    Turns completion photos into variants with a process pool.
+
+    Threads fetch originals and upload variants while the processes decode
+    and encode, so network waits and CPU work overlap. ``process`` needs no
+    database and is what the benchmark drives; ``run`` is the long-lived
+    worker that feeds it from the database and the event feed.
+    """
+
+    def __init__(self, store, processes=PHOTO_PROCESSES):
+        self.store = store
+        self.processes = processes
+        self._pool = None
+
+    def process(self, photos):
+        """
+        Render ``{user_task_id: photo_url}``; returns ``{user_task_id: variants}``.
+
+        ``variants`` maps variant names to URLs, and is empty for photos that
+        are missing or cannot be decoded so they are not retried. Photos that
+        fail for other reasons (e.g. the store is unreachable) are left out.
+        """
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.processes)
+        with ThreadPoolExecutor(self.processes * 2) as io_pool:
+            futures = {
+                user_task_id: io_pool.submit(self._process_one, photo_url)
+                for user_task_id, photo_url in photos.items()
+            }
+        results = {}
+        for user_task_id, future in futures.items():
+            try:
+                results[user_task_id] = future.result()
+            except Exception as e:
+                logger.warning("Photo for completion %s will be retried: %s", user_task_id, e)
+                if isinstance(e, BrokenProcessPool) and self._pool is not None:
+                    # A process died (e.g. out of memory); reap the broken pool, start a fresh one next time
+                    self._pool.shutdown(wait=False, cancel_futures=True)
+                    self._pool = None
+        return results
+
+    def _process_one(self, photo_url):
+        key = key_for_url(photo_url, self.store.base_url)
+        try:
+            data = self.store.get(key)
+        except PhotoMissing:
+            logger.warning("Photo %s does not exist; skipping", key)
+            return {}
+        try:
+            rendered = self._pool.submit(render_variants, data).result()
+        except BrokenProcessPool:
+            raise
+        except Exception as e:
+            logger.warning("Photo %s could not be rendered: %s", key, e)
+            return {}
+        urls = {}
+        for name, size, fmt in PHOTO_VARIANTS:
+            target = variant_key(key, name, fmt)
+            self.store.put(target, rendered[name], FORMAT_OPTIONS[fmt]["content_type"])
+            urls[name] = self.store.url(target)
+        return urls
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def run(self, app, follow=True):
+        """
+        Process every completion without variants, then (with ``follow``)
+        keep going as completion events arrive.
+        """
+        from events import broadcaster
+
+        wakeups = queue.Queue()
+        with app.app_context():
+            if follow:
+                broadcaster.add_handler(
+                    lambda event_type, data: wakeups.put(None) if event_type in ("completion", "resync") else None
+                )
+                broadcaster.ensure_listening()
+            while True:
+                while self.sweep():
+                    pass
+                if not follow:
+                    return
+                try:
+                    wakeups.get(timeout=PHOTO_SWEEP_SECONDS)
+                except queue.Empty:
+                    continue
+                # One sweep covers a burst of completions
+                while not wakeups.empty():
+                    wakeups.get_nowait()
+
+    def sweep(self):
+        """
+        Process one batch of pending completions that are due; returns how
+        many were attempted, so callers can loop until nothing is left.
+
+        Failures are pushed back with a growing delay, so a run of photos the
+        store cannot serve does not hold up newer completions.
+        """
+        from sqlalchemy import case, func, literal_column, or_, update
+        from events import publish
+        from models import db, UserTasks
+
+        pending = db.session.query(UserTasks.user_task_id, UserTasks.photo_url) \
+            .filter(
+                UserTasks.photo_variants.is_(None),
+                UserTasks.photo_url.isnot(None),
+                or_(UserTasks.photo_retry_at.is_(None), UserTasks.photo_retry_at <= func.now()),
+            ) \
+            .order_by(UserTasks.user_task_id) \
+            .limit(PHOTO_BATCH_SIZE) \
+            .all()
+        db.session.commit()
+        if not pending:
+            return 0
+
+        results = self.process(dict(pending))
+        if results:
+            db.session.execute(update(UserTasks), [
+                {"user_task_id": user_task_id, "photo_variants": variants}
+                for user_task_id, variants in results.items()
+            ])
+            publish([
+                ("photo_variants", {"user_task_id": user_task_id, "photo_variants": variants})
+                for user_task_id, variants in results.items() if variants
+            ])
+        failed = [user_task_id for user_task_id, _ in pending if user_task_id not in results]
+        if failed:
+            delay_minutes = func.least(func.power(2, UserTasks.photo_attempts), PHOTO_RETRY_MAX_MINUTES)
+            db.session.execute(
+                update(UserTasks)
+                .where(UserTasks.user_task_id.in_(failed))
+                .values(
+                    photo_attempts=UserTasks.photo_attempts + 1,
+                    photo_retry_at=func.now() + delay_minutes * literal_column("interval '1 minute'"),
+                    # Out of attempts: record no variants so the feed keeps the original
+                    photo_variants=case(
+                        (UserTasks.photo_attempts + 1 >= PHOTO_MAX_ATTEMPTS, literal_column("'{}'::jsonb")),
+                        else_=None,
+                    ),
+                ),
+                execution_options={"synchronize_session": False},
+            )
+        db.session.commit()
+        return len(pending)
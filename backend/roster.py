@@ -0,0 +1,157 @@
+# Bulk crew roster import
+import csv
+import io
+import json
+from sqlalchemy import exists, func, select
+from sqlalchemy.dialects.postgresql import array, insert
+from models import db, Teams, User, TeamPoints, UserPoints
+from passwords import password_hasher
+
+ROSTER_FIELDS = ("email", "username", "password", "team_name")
+ROSTER_BATCH_SIZE = 500
+JOIN_ID_SEQUENCE = "teams_join_seq"
+
+
+class InvalidRoster(ValueError):
+    """Raised when a roster file cannot be parsed."""
+
+
+def parse_roster(text, fmt):
+    """Parse a CSV (with a header row) or JSON array roster into a list of dicts."""
+    if fmt == "json":
+        try:
+            rows = json.loads(text)
+        except ValueError as e:
+            raise InvalidRoster(f"Invalid JSON roster: {e}") from e
+        if not isinstance(rows, list):
+            raise InvalidRoster("JSON roster must be an array of objects")
+        return rows
+    if fmt == "csv":
+        return list(csv.DictReader(io.StringIO(text)))
+    raise InvalidRoster("Roster format must be csv or json")
+
+
+def ensure_teams(team_names):
+    """
+    Create any missing teams and return {team_name: team_id}.
+
+    One INSERT ... SELECT for the names not in Teams yet; join_id comes from a
+    sequence, so concurrent registrations never mint the same id. Existing
+    names are filtered out before nextval runs, as join_id has room for six
+    digits only; ON CONFLICT DO NOTHING covers a team created concurrently.
+    """
+    names = sorted(set(team_names))
+    if not names:
+        return {}
+
+    requested = func.unnest(array(names, type_=Teams.team_name.type)) \
+        .table_valued("team_name").render_derived(name="requested")
+    created = db.session.execute(
+        insert(Teams)
+        .from_select(
+            ["team_name", "join_id"],
+            select(requested.c.team_name, func.concat("TEAM", func.nextval(JOIN_ID_SEQUENCE)))
+            .where(~exists().where(Teams.team_name == requested.c.team_name)),
+        )
+        .on_conflict_do_nothing(index_elements=[Teams.team_name])
+        .returning(Teams.team_id)
+    ).scalars().all()
+    if created:
+        db.session.execute(
+            insert(TeamPoints)
+            .values([{"team_id": team_id, "total_points": 0} for team_id in created])
+            .on_conflict_do_nothing()
+        )
+
+    rows = db.session.execute(
+        select(Teams.team_name, Teams.team_id).where(Teams.team_name.in_(names))
+    ).all()
+    return dict(rows)
+
+
+def _validate(row):
+    if not isinstance(row, dict):
+        return "Row must be an object"
+    missing = [field for field in ROSTER_FIELDS if not row.get(field)]
+    if missing:
+        return f"Missing {', '.join(missing)}"
+    if not all(isinstance(row[field], str) for field in ROSTER_FIELDS):
+        return "Fields must be strings"
+    return None
+
+
+def import_roster(rows, batch_size=ROSTER_BATCH_SIZE):
+    """
+    Create the teams and users in ``rows``.
+
+    Passwords are hashed in parallel across the hashing pool. Users whose
+    email or username already exists are skipped. Each batch of users commits
+    as a single multi-row insert.
+    Returns a summary dict with created/skipped counts and per-row errors.
+    """
+    errors = []
+    valid = []
+    for index, row in enumerate(rows):
+        error = _validate(row)
+        if error:
+            errors.append({"index": index, "error": error})
+        else:
+            valid.append(row)
+
+    created = 0
+    skipped = 0
+    try:
+        team_ids = ensure_teams(row["team_name"] for row in valid)
+        db.session.commit()
+
+        for offset in range(0, len(valid), batch_size):
+            batch = valid[offset:offset + batch_size]
+
+            # Don't spend hashing time on users that already exist
+            existing = set(db.session.execute(
+                select(User.email).where(User.email.in_([row["email"] for row in batch]))
+            ).scalars())
+            existing_names = set(db.session.execute(
+                select(User.username).where(User.username.in_([row["username"] for row in batch]))
+            ).scalars())
+            new_rows = [
+                row for row in batch
+                if row["email"] not in existing and row["username"] not in existing_names
+            ]
+            skipped += len(batch) - len(new_rows)
+            if not new_rows:
+                continue
+            batch = new_rows
+
+            hashes = password_hasher.hash_many([row["password"] for row in batch])
+            values = [
+                {
+                    "email": row["email"],
+                    "username": row["username"],
+                    "password": hashed,
+                    "team_id": team_ids[row["team_name"]],
+                }
+                for row, hashed in zip(batch, hashes)
+            ]
+            user_ids = db.session.execute(
+                insert(User).values(values).on_conflict_do_nothing().returning(User.user_id)
+            ).scalars().all()
+            if user_ids:
+                db.session.execute(
+                    insert(UserPoints)
+                    .values([{"user_id": user_id, "total_points": 0} for user_id in user_ids])
+                    .on_conflict_do_nothing()
+                )
+            db.session.commit()
+            created += len(user_ids)
+            skipped += len(batch) - len(user_ids)
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return {
+        "created": created,
+        "skipped": skipped,
+        "teams": len(team_ids),
+        "errors": errors,
+    }
@@ -0,0 +1,215 @@
+# Materialized point totals kept in step with UserTasks
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from models import db, Teams, User, UserTasks, Tasks, TeamPoints, UserPoints, UserPointCounts
+
+
+def add_team_points(team_id, points):
+    """
+    Add points to a team's running total.
+
+    Runs inside the caller's session so the increment commits (or rolls back)
+    together with the UserTasks row that earned it. Returns the new total.
+    """
+    if team_id is None or not points:
+        return None
+
+    stmt = insert(TeamPoints).values(team_id=team_id, total_points=points)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TeamPoints.team_id],
+        set_={
+            "total_points": TeamPoints.total_points + stmt.excluded.total_points,
+            "updated_at": func.now(),
+        },
+    ).returning(TeamPoints.total_points)
+    return db.session.execute(stmt).scalar()
+
+
+def add_user_points(user_id, points):
+    """
+    Add points to a user's running total, in the caller's transaction.
+    """
+    if not points:
+        return
+
+    stmt = insert(UserPoints).values(user_id=user_id, total_points=points)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserPoints.user_id],
+        set_={
+            "total_points": UserPoints.total_points + stmt.excluded.total_points,
+            "updated_at": func.now(),
+        },
+    )
+    db.session.execute(stmt)
+
+
+def rebuild_team_points():
+    """
+    Recompute every team's total from UserTasks and replace the stored totals.
+
+    Teams without any completions get a row with zero points.
+    """
+    totals = (
+        select(
+            Teams.team_id,
+            func.coalesce(func.sum(Tasks.points), 0),
+        )
+        .select_from(Teams)
+        .outerjoin(User, User.team_id == Teams.team_id)
+        .outerjoin(UserTasks, UserTasks.user_id == User.user_id)
+        .outerjoin(Tasks, Tasks.task_id == UserTasks.task_id)
+        .group_by(Teams.team_id)
+    )
+
+    try:
+        db.session.query(TeamPoints).delete()
+        db.session.execute(
+            insert(TeamPoints).from_select(["team_id", "total_points"], totals)
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return db.session.query(TeamPoints).count()
+
+
+def rebuild_user_points():
+    """
+    Recompute every user's total from UserTasks and replace the stored totals.
+    """
+    totals = (
+        select(
+            User.user_id,
+            func.coalesce(func.sum(Tasks.points), 0),
+        )
+        .select_from(User)
+        .outerjoin(UserTasks, UserTasks.user_id == User.user_id)
+        .outerjoin(Tasks, Tasks.task_id == UserTasks.task_id)
+        .group_by(User.user_id)
+    )
+
+    try:
+        db.session.query(UserPoints).delete()
+        db.session.execute(
+            insert(UserPoints).from_select(["user_id", "total_points"], totals)
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return db.session.query(UserPoints).count()
+
+
+def _leaderboard_query():
+    return db.session.query(
+        UserPoints.user_id,
+        User.username,
+        User.team_id,
+        UserPoints.total_points,
+    ).join(User, User.user_id == UserPoints.user_id)
+
+
+def _leaderboard_entry(row, rank):
+    user_id, username, team_id, total_points = row
+    return {
+        "rank": rank,
+        "user_id": user_id,
+        "username": username,
+        "team_id": team_id,
+        "total_points": total_points,
+    }
+
+
+def _window_ranks(window):
+    """
+    Competition ranks for a contiguous slice of the ordering, users tied on
+    points sharing a rank.
+
+    Read from UserPointCounts, so the cost follows the number of distinct
+    scores above the slice rather than the number of users ahead of it.
+    """
+    top = window[0].total_points
+    above_top, at_top = db.session.query(
+        func.coalesce(func.sum(UserPointCounts.users).filter(UserPointCounts.total_points > top), 0),
+        func.coalesce(func.sum(UserPointCounts.users).filter(UserPointCounts.total_points == top), 0),
+    ).filter(UserPointCounts.total_points >= top).one()
+
+    # Everyone on the top score is ahead of a lower score, along with the
+    # slice's rows in between (no one outside the slice can sit between them)
+    tied_at_top = sum(1 for row in window if row.total_points == top)
+    ranks = []
+    for offset, row in enumerate(window):
+        if row.total_points == top:
+            ranks.append(int(above_top) + 1)
+        elif row.total_points != window[offset - 1].total_points:
+            ranks.append(int(above_top) + int(at_top) + offset - tied_at_top + 1)
+        else:
+            ranks.append(ranks[-1])
+    return ranks
+
+
+def _ranked(rows, first_position, first_rank):
+    """Assign competition ranks to a contiguous slice of the ordering."""
+    entries = []
+    previous_points = None
+    rank = first_rank
+    for offset, row in enumerate(rows):
+        if offset and row.total_points != previous_points:
+            rank = first_position + offset
+        entries.append(_leaderboard_entry(row, rank))
+        previous_points = row.total_points
+    return entries
+
+
+def top_users(limit):
+    """Return the top ``limit`` users, read straight off the rank index."""
+    rows = _leaderboard_query() \
+        .order_by(UserPoints.total_points.desc(), UserPoints.user_id) \
+        .limit(limit) \
+        .all()
+    return _ranked(rows, 1, 1)
+
+
+def users_around(user_id, radius):
+    """
+    Return the caller's entry plus up to ``radius`` neighbours on each side.
+
+    Neighbours come from two bounded scans of ix_userpoints_rank and ranks
+    from the per-score counts, so no query walks the users ahead of the caller.
+    """
+    points = db.session.query(UserPoints.total_points) \
+        .filter(UserPoints.user_id == user_id) \
+        .scalar()
+    if points is None:
+        return None, []
+
+    # Rows ordered before the caller: more points, or equal points and lower id
+    ahead = or_(
+        UserPoints.total_points > points,
+        and_(UserPoints.total_points == points, UserPoints.user_id < user_id),
+    )
+    behind = or_(
+        UserPoints.total_points < points,
+        and_(UserPoints.total_points == points, UserPoints.user_id > user_id),
+    )
+
+    above = []
+    below = []
+    if radius:
+        above = _leaderboard_query().filter(ahead) \
+            .order_by(UserPoints.total_points.asc(), UserPoints.user_id.desc()) \
+            .limit(radius) \
+            .all()
+        above.reverse()
+        below = _leaderboard_query().filter(behind) \
+            .order_by(UserPoints.total_points.desc(), UserPoints.user_id) \
+            .limit(radius) \
+            .all()
+    me = _leaderboard_query().filter(UserPoints.user_id == user_id).one()
+
+    window = above + [me] + below
+    entries = [_leaderboard_entry(row, rank) for row, rank in zip(window, _window_ranks(window))]
+
+    return entries[len(above)], entries
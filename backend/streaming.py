@@ -0,0 +1,35 @@
+# Constant-memory JSON export for the large list endpoints
+import json
+from flask import Response, request, stream_with_context
+
+STREAM_BATCH_SIZE = 500
+
+
+def wants_stream():
+    """True when the client asked for the streamed export with ``?stream=1``."""
+    return request.args.get("stream", "").lower() in ("1", "true", "yes")
+
+
+def stream_json(query, serialize, key=None, batch_size=STREAM_BATCH_SIZE):
+    """
+    Stream the rows of ``query`` as a JSON array, or as ``{key: [...]}``.
+
+    Rows are fetched with ``yield_per``, which makes psycopg2 use a server-side
+    cursor, and written out one batch at a time, so memory stays flat however
+    many rows the query returns.
+    """
+    def generate():
+        yield f'{{"{key}": [' if key else "["
+        buffer = []
+        first = True
+        for row in query.yield_per(batch_size):
+            buffer.append(("" if first else ",") + json.dumps(serialize(row)))
+            first = False
+            if len(buffer) >= batch_size:
+                yield "".join(buffer)
+                buffer = []
+        if buffer:
+            yield "".join(buffer)
+        yield "]}" if key else "]"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
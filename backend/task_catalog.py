@@ -0,0 +1,100 @@
+# In-process cache of the Tasks catalog
+import hashlib
+import json
+import threading
+import time
+from collections import namedtuple
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import Tasks
+
+# Changes made by other worker processes are picked up within this window
+CATALOG_TTL_SECONDS = 60
+
+CatalogSnapshot = namedtuple("CatalogSnapshot", ["version", "tasks", "by_id", "task_ids", "etag"])
+
+
+class TaskCatalog:
+    """
+    Versioned, read-only copy of the Tasks table.
+
+    The catalog is tiny and rarely changes, so it is loaded once and served
+    from memory. Commits that touch Tasks in this process invalidate it
+    immediately; the TTL bounds staleness for writes made elsewhere.
+    """
+
+    def __init__(self, ttl=CATALOG_TTL_SECONDS):
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._loaded_at = 0.0
+        self._version = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+            self._version += 1
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._loaded_at < self._ttl:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is not None and time.monotonic() - self._loaded_at < self._ttl:
+                return self._snapshot
+            self._snapshot = self._load(self._version)
+            self._loaded_at = time.monotonic()
+            return self._snapshot
+
+    def get(self, task_id):
+        """Return the task's dict, or None if it does not exist."""
+        return self.snapshot().by_id.get(task_id)
+
+    @staticmethod
+    def _load(version):
+        tasks = [task.to_dict() for task in Tasks.query.order_by(Tasks.task_id).all()]
+        body = json.dumps(tasks, sort_keys=True).encode()
+        return CatalogSnapshot(
+            version=version,
+            tasks=tasks,
+            by_id={task["task_id"]: task for task in tasks},
+            task_ids=[task["task_id"] for task in tasks],
+            etag=hashlib.sha1(body).hexdigest(),
+        )
+
+
+task_catalog = TaskCatalog()
+
+
+@event.listens_for(Session, "before_flush")
+def _mark_catalog_changes(session, flush_context, instances):
+    changed = session.new | session.dirty | session.deleted
+    if any(isinstance(obj, Tasks) for obj in changed):
+        session.info["task_catalog_dirty"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    if session.info.pop("task_catalog_dirty", False):
+        task_catalog.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("task_catalog_dirty", None)
+
+
+def conditional_response(response, etag=None):
+    """
+    Tag ``response`` with a strong ETag and turn it into a 304 if the client's
+    If-None-Match already matches. Without ``etag`` the body is hashed.
+    """
+    if etag is None:
+        response.add_etag()
+    else:
+        response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
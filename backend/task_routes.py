@@ -1,10 +1,19 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-import boto3
-import os
-import uuid
-from datetime import datetime
+from flask import Blueprint, current_app, request, jsonify
+from flask_jwt_extended import jwt_required
+from datetime import datetime, timezone
+from identity import current_identity
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from metrics import query_budget
 from models import db, User, Tasks, UserTasks
+from scores import add_team_points, add_user_points
+from events import publish
+from pagination import paginate, paginate_sorted, page_size, array_response, CursorError, MAX_PAGE_SIZE
+from task_catalog import task_catalog, conditional_response
+from completed_tasks import open_tasks, record_completions
+from streaming import wants_stream, stream_json
+import idempotency
+from uploads import sign_upload, InvalidUpload, S3_BUCKET_NAME, MAX_BATCH_UPLOADS
 from functools import wraps
 from flask_jwt_extended import verify_jwt_in_request
 from dotenv import load_dotenv
@@ -22,14 +31,9 @@ def jwt_optional(fn):
             return fn(*args, **kwargs)
     return wrapper
 
-# Initialize S3 client
-s3_client = boto3.client(
-    "s3",
-    region_name=os.getenv("AWS_REGION"),
-    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
-)
-S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME", "astronaut-app-images-bucket")
+
+# Upper bound on items accepted by /api/tasks/complete-batch
+MAX_BATCH_COMPLETIONS = 500
 
 # Create a Blueprint for task routes
 task_routes = Blueprint("task_routes", __name__)
@@ -37,15 +41,35 @@ task_routes = Blueprint("task_routes", __name__)
 
 @task_routes.route("/api/tasks/not-completed", methods=["GET"])
 @jwt_required()
+@query_budget(4)
 def get_tasks_not_completed_by_user():
     """
     Get a list of tasks not completed by the current user.
     ---
     tags:
       - Tasks
+    parameters:
+      - name: cursor
+        in: query
+        required: false
+        schema:
+          type: string
+        description: Opaque cursor returned in the X-Next-Cursor header of the previous page
+      - name: limit
+        in: query
+        required: false
+        schema:
+          type: integer
+          default: 50
+        description: Page size (max 200)
     responses:
       200:
         description: List of tasks not completed by the user
+        headers:
+          X-Next-Cursor:
+            description: Cursor for the next page, absent on the last page
+            schema:
+              type: string
         content:
           application/json:
             schema:
@@ -68,39 +92,72 @@ def get_tasks_not_completed_by_user():
                   points:
                     type: integer
                     description: Points awarded for completing the task
+      304:
+        description: List unchanged since the ETag sent in If-None-Match
+      400:
+        description: Malformed cursor
       500:
         description: Server error
     """
     # Get the current user's email from the JWT
-    current_user_email = get_jwt_identity()
-    user = User.query.filter_by(email=current_user_email).first()
+    user = current_identity()
     if not user:
         return jsonify({"error": "User not found"}), 404
 
     try:
         # Get tasks not completed by the user
-        completed_task_ids = db.session.query(UserTasks.task_id).filter_by(user_id=user.user_id).subquery()
-        tasks_not_completed = Tasks.query.filter(~Tasks.task_id.in_(completed_task_ids)).all()
+        open_tasks = open_tasks_for_user(user.user_id)
+        tasks_not_completed, next_cursor = paginate_sorted(
+            open_tasks, [task["task_id"] for task in open_tasks], page_size()
+        )
 
         # Return tasks not completed
-        return jsonify([task.to_dict() for task in tasks_not_completed]), 200
+        return conditional_response(array_response(tasks_not_completed, next_cursor))
+    except CursorError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        print(e)
+        current_app.logger.exception(e)
         return jsonify({"error": str(e)}), 500
 
 
 
 @task_routes.route("/api/tasks", methods=["GET"])
 @jwt_required()
+@query_budget(1)
 def get_all_asks():
     """
-    Get all tasks.
+    Get all tasks, one page at a time.
     ---
     tags:
       - Tasks
+    parameters:
+      - name: cursor
+        in: query
+        required: false
+        schema:
+          type: string
+        description: Opaque cursor returned in the X-Next-Cursor header of the previous page
+      - name: limit
+        in: query
+        required: false
+        schema:
+          type: integer
+          default: 50
+        description: Page size (max 200)
+      - name: stream
+        in: query
+        required: false
+        schema:
+          type: boolean
+        description: Stream every row in constant memory instead of returning one page
     responses:
       200:
         description: Tasks retrieved successfully
+        headers:
+          X-Next-Cursor:
+            description: Cursor for the next page, absent on the last page
+            schema:
+              type: string
         content:
           application/json:
             schema:
@@ -123,14 +180,26 @@ def get_all_asks():
                   points:
                     type: integer
                     description: Points awarded for completing the task
+      400:
+        description: Malformed cursor
+      304:
+        description: Catalog unchanged since the ETag sent in If-None-Match
       500:
         description: Error retrieving tasks
     """
-    tasks = Tasks.query.all()
+    if wants_stream():
+        return stream_json(Tasks.query.order_by(Tasks.task_id), Tasks.to_dict)
+
     try:
-        return jsonify([task.to_dict() for task in tasks]), 200
+        catalog = task_catalog.snapshot()
+        limit = page_size()
+        tasks, next_cursor = paginate_sorted(catalog.tasks, catalog.task_ids, limit)
+        etag = f"{catalog.etag}-{request.args.get('cursor', '')}-{limit}"
+        return conditional_response(array_response(tasks, next_cursor), etag)
+    except CursorError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        print(e)
+        current_app.logger.exception(e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -141,6 +210,7 @@ def get_all_asks():
 
 @task_routes.route("/api/tasks/<int:task_id>", methods=["GET"])
 @jwt_required()
+@query_budget(1)
 def get_task_by_id(task_id):
     """
     Get a task by ID.
@@ -176,18 +246,22 @@ def get_task_by_id(task_id):
                 points:
                   type: integer
                   description: Points awarded for completing the task
+      304:
+        description: Task unchanged since the ETag sent in If-None-Match
       404:
         description: Task not found
     """
-    task = Tasks.query.get(task_id)
+    catalog = task_catalog.snapshot()
+    task = catalog.by_id.get(task_id)
     if not task:
         return jsonify({"error": "Task not found"}), 404
 
-    return jsonify(task.to_dict()), 200
+    return conditional_response(jsonify(task), f"{catalog.etag}-{task_id}")
 
 
 @task_routes.route("/api/generate-presigned-url", methods=["POST"])
 @jwt_required()
+@query_budget(0)
 def generate_presigned_url():
     """
     Generate a pre-signed URL for direct upload to S3.
@@ -203,6 +277,10 @@ def generate_presigned_url():
               file_name:
                 type: string
                 description: "Name of the file to be uploaded"
+              method:
+                type: string
+                enum: [put, post]
+                description: "put (default) for a pre-signed PUT URL, post for a pre-signed POST policy with size and type limits"
     responses:
       200:
         description: "Pre-signed URL generated successfully"
@@ -214,45 +292,111 @@ def generate_presigned_url():
                 url:
                   type: string
                   description: "Pre-signed URL for upload"
+                fields:
+                  type: object
+                  description: "Form fields to send with a POST upload"
                 file_key:
                   type: string
                   description: "Unique file key in S3"
+      400:
+        description: "Invalid file type or method"
       500:
         description: "Error generating pre-signed URL"
     """
     data = request.json
     file_name = data.get("file_name")
-    
-    # Validate the file extension
-    allowed_extensions = {"jpeg", "jpg", "png"}
-    file_extension = file_name.rsplit(".", 1)[-1].lower()  # Get the extension
-    if file_extension not in allowed_extensions:
-        return jsonify({"error": "Invalid file type. Only jpeg, jpg, or png allowed."}), 400
-
-    # Set the appropriate content type
-    content_type = f"image/{'jpeg' if file_extension in ['jpeg', 'jpg'] else 'png'}"
-    
-    # Generate a unique file key for S3
-    file_key = f"{uuid.uuid4().hex}_{file_name}"
-    
+    method = data.get("method", "put")
+
     try:
-        # Generate the pre-signed URL for a PUT operation
-        presigned_url = s3_client.generate_presigned_url(
-            "put_object",
-            Params={
-                "Bucket": S3_BUCKET_NAME,
-                "Key": file_key,
-                "ContentType": content_type  # Use the determined content type
-            },
-            ExpiresIn=3600  # URL is valid for 1 hour
-        )
-        return jsonify({"url": presigned_url, "file_key": file_key}), 200
+        return jsonify(sign_upload(file_name, method)), 200
+    except InvalidUpload as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@task_routes.route("/api/generate-presigned-urls", methods=["POST"])
+@jwt_required()
+@query_budget(0)
+def generate_presigned_urls():
+    """
+    Generate pre-signed uploads for many files in one call.
+    ---
+    tags:
+      - Upload
+    requestBody:
+      content:
+        application/json:
+          schema:
+            type: object
+            properties:
+              file_names:
+                type: array
+                items:
+                  type: string
+                description: "Names of the files to be uploaded (max 50)"
+              method:
+                type: string
+                enum: [put, post]
+                description: "put for pre-signed PUT URLs, post for pre-signed POST policies"
+    responses:
+      200:
+        description: "One upload target per file, in request order"
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                uploads:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      file_name:
+                        type: string
+                        description: "Name of the file as sent"
+                      url:
+                        type: string
+                        description: "Pre-signed URL for upload"
+                      fields:
+                        type: object
+                        description: "Form fields to send with a POST upload"
+                      file_key:
+                        type: string
+                        description: "Unique file key in S3"
+                      error:
+                        type: string
+                        description: "Why this file could not be signed"
+      400:
+        description: "Missing or oversized file_names list"
+      500:
+        description: "Error generating pre-signed URLs"
+    """
+    data = request.json or {}
+    file_names = data.get("file_names")
+    method = data.get("method", "put")
+    if not isinstance(file_names, list) or not file_names:
+        return jsonify({"error": "file_names must be a non-empty list"}), 400
+    if len(file_names) > MAX_BATCH_UPLOADS:
+        return jsonify({"error": f"At most {MAX_BATCH_UPLOADS} files per batch"}), 400
+    if method not in ("put", "post"):
+        return jsonify({"error": "method must be 'put' or 'post'"}), 400
+
+    uploads = []
+    try:
+        for file_name in file_names:
+            try:
+                uploads.append({"file_name": file_name, **sign_upload(file_name, method)})
+            except InvalidUpload as e:
+                uploads.append({"file_name": file_name, "error": str(e)})
+        return jsonify({"uploads": uploads}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 @task_routes.route("/api/tasks/<int:task_id>/complete", methods=["POST"])
 @jwt_required()
+@query_budget(10)
 def complete_task(task_id):
     """
     Complete a task by saving the S3 link of the uploaded photo.
@@ -265,6 +409,11 @@ def complete_task(task_id):
         required: true
         type: integer
         description: ID of the task to mark as complete
+      - name: Idempotency-Key
+        in: header
+        required: false
+        type: string
+        description: Client-chosen key (max 64 chars); retries with the same key return the original result
       - name: body
         in: body
         required: true
@@ -276,18 +425,29 @@ def complete_task(task_id):
               description: The file key of the uploaded image in S3
     responses:
       201:
-        description: Task marked as completed successfully
+        description: Task marked as completed successfully (or replayed, see the Idempotent-Replayed header)
       400:
         description: Invalid input or task does not exist
+      422:
+        description: Idempotency key was already used to complete a different task
       500:
         description: Server error
     """
-    current_user_email = get_jwt_identity()
-    user = User.query.filter_by(email=current_user_email).first()
+    user = current_identity()
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    task = Tasks.query.get(task_id)
+    try:
+        idempotency_key = idempotency.request_key()
+    except idempotency.InvalidIdempotencyKey as e:
+        return jsonify({"error": str(e)}), 400
+
+    # A retried delivery gets the original result without another write
+    original = idempotency.lookup(user.user_id, idempotency_key)
+    if original:
+        return _replay(original, task_id)
+
+    task = task_catalog.get(task_id)
     if not task:
         return jsonify({"error": "Task not found"}), 404
 
@@ -297,7 +457,9 @@ def complete_task(task_id):
         return jsonify({"error": "file_key is required"}), 400
 
     # Construct the S3 URL
-    photo_url = f"https://{S3_BUCKET_NAME}.s3.amazonaws.com/{photo_key}"
+    photo_url = photo_url_for(photo_key)
+    if len(photo_url) > PHOTO_URL_MAX_LENGTH:
+        return jsonify({"error": "file_key is too long"}), 400
     
     # Record task completion in UserTasks table
     try:
@@ -305,17 +467,146 @@ def complete_task(task_id):
             user_id=user.user_id,
             task_id=task_id,
             photo_url=photo_url,
-            completed_at=datetime.utcnow()
+            completed_at=datetime.utcnow(),
+            idempotency_key=idempotency_key
         )
         db.session.add(new_completion)
+        db.session.flush()
+        team_total = add_team_points(user.team_id, task["points"])
+        add_user_points(user.user_id, task["points"])
+        publish(_completion_events(user, [new_completion], {task_id: task}, task["points"], team_total))
+        record_completions(user.user_id, [task_id])
         db.session.commit()
-        return jsonify({"message": "Task marked as completed", "photo_url": photo_url}), 201
+        idempotency.remember(user.user_id, idempotency_key, new_completion)
+        return _completion_response({"photo_url": photo_url})
+    except IntegrityError as e:
+        db.session.rollback()
+        # A concurrent delivery with the same key won the race
+        original = idempotency.lookup(user.user_id, idempotency_key)
+        if original:
+            return _replay(original, task_id)
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+@task_routes.route("/api/tasks/complete-batch", methods=["POST"])
+@jwt_required()
+@query_budget(14)
+def complete_tasks_batch():
+    """
+    Complete many tasks in one request, e.g. when replaying an offline queue.
+    ---
+    tags:
+      - Tasks
+    requestBody:
+      content:
+        application/json:
+          schema:
+            type: object
+            properties:
+              completions:
+                type: array
+                description: "Up to 500 queued completions"
+                items:
+                  type: object
+                  required:
+                    - task_id
+                    - file_key
+                  properties:
+                    task_id:
+                      type: integer
+                      description: ID of the task to mark as complete
+                    file_key:
+                      type: string
+                      description: The file key of the uploaded image in S3
+                    completed_at:
+                      type: string
+                      description: "ISO 8601 time the task was completed offline; defaults to now"
+                    idempotency_key:
+                      type: string
+                      description: "Client-chosen key (max 64 chars); an item whose key was already recorded is replayed, not re-inserted"
+    responses:
+      200:
+        description: Per-item results, in request order
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                completed:
+                  type: integer
+                  description: Number of items recorded
+                replayed:
+                  type: integer
+                  description: Number of items whose idempotency key was already recorded
+                failed:
+                  type: integer
+                  description: Number of items rejected
+                results:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      index:
+                        type: integer
+                        description: Position of the item in the request
+                      status:
+                        type: string
+                        description: "completed, replayed or error"
+                      user_task_id:
+                        type: integer
+                        description: ID of the recorded completion
+                      photo_url:
+                        type: string
+                        description: S3 URL of the completion photo
+                      error:
+                        type: string
+                        description: Why the item was rejected
+      400:
+        description: Missing or oversized completions list
+      404:
+        description: User not found
+      500:
+        description: Server error
+    """
+    user = current_identity()
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+
+    data = request.json or {}
+    items = data.get("completions")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "completions must be a non-empty list"}), 400
+    if len(items) > MAX_BATCH_COMPLETIONS:
+        return jsonify({"error": f"At most {MAX_BATCH_COMPLETIONS} completions per batch"}), 400
+
+    try:
+        results, rows = _record_batch(items, user)
+    except IntegrityError:
+        db.session.rollback()
+        # A concurrent replay recorded some of the same keys; those now resolve as replays
+        try:
+            results, rows = _record_batch(items, user)
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({"error": str(e)}), 500
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
+    return jsonify({
+        "completed": len(rows),
+        "replayed": sum(1 for result in results if result["status"] == "replayed"),
+        "failed": sum(1 for result in results if result["status"] == "error"),
+        "results": results,
+    }), 200
+
+
 @task_routes.route("/api/user-tasks/recent/<int:n>", methods=["GET"])
 @jwt_required()
+@query_budget(1)
 def get_recent_user_tasks(n):
     """
     Get the last n UserTasks with additional data like task name, points, and username.
@@ -327,10 +618,27 @@ def get_recent_user_tasks(n):
         in: path
         required: true
         type: integer
-        description: Number of most recent UserTasks to retrieve
+        description: Number of most recent UserTasks to retrieve (max 200)
+      - name: cursor
+        in: query
+        required: false
+        schema:
+          type: string
+        description: Opaque cursor returned in the X-Next-Cursor header of the previous page
+      - name: stream
+        in: query
+        required: false
+        schema:
+          type: boolean
+        description: Stream the whole completion history, newest first, ignoring n
     responses:
       200:
         description: List of most recent UserTasks with detailed information
+        headers:
+          X-Next-Cursor:
+            description: Cursor for the next page, absent on the last page
+            schema:
+              type: string
         content:
           application/json:
             schema:
@@ -358,39 +666,244 @@ def get_recent_user_tasks(n):
                     description: Username of the user who completed the task
                   photo_url:
                     type: string
-                    description: URL of the completion photo
+                    description: URL of the full-size completion photo
+                  photo_variants:
+                    type: object
+                    description: "URLs of resized copies (large and thumb as WebP, thumb_jpeg as JPEG); empty until processed"
                   completed_at:
                     type: string
                     description: Completion timestamp
+      400:
+        description: Malformed cursor
       500:
         description: Server error
     """
+    query = recent_completions_query()
+    if wants_stream():
+        return stream_json(
+            query.order_by(UserTasks.completed_at.desc(), UserTasks.user_task_id.desc()),
+            lambda row: _recent_task_dict(*row),
+        )
+
+    n = max(1, min(n, MAX_PAGE_SIZE))
     try:
-        # Query for the recent tasks, joining User and Task details
-        recent_tasks = (
-            db.session.query(UserTasks, User.username, Tasks.task_name, Tasks.points)
-            .join(User, UserTasks.user_id == User.user_id)
-            .join(Tasks, UserTasks.task_id == Tasks.task_id)
-            .order_by(UserTasks.completed_at.desc())
-            .limit(n)
-            .all()
+        recent_tasks, next_cursor = paginate(
+            query,
+            [UserTasks.completed_at, UserTasks.user_task_id],
+            (datetime.fromisoformat, int),
+            n,
+            descending=True,
         )
         
         # Format response with the required data
         response = [
-            {
-                "user_task_id": task.user_task_id,
-                "user_id": task.user_id,
-                "task_id": task.task_id,
-                "task_name": task_name,
-                "points": points,
-                "username": username,
-                "photo_url": task.photo_url,
-                "completed_at": task.completed_at.strftime("%Y-%m-%d %H:%M:%S")
-            }
+            _recent_task_dict(task, username, task_name, points)
             for task, username, task_name, points in recent_tasks
         ]
         
-        return jsonify(response), 200
+        return array_response(response, next_cursor), 200
+    except CursorError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+# Longest photo_url the UserTasks column can hold
+PHOTO_URL_MAX_LENGTH = UserTasks.photo_url.type.length
+
+
+def photo_url_for(file_key):
+    return f"https://{S3_BUCKET_NAME}.s3.amazonaws.com/{file_key}"
+
+
+def _replay(original, task_id):
+    """Answer a retry with the original result, unless its key belongs to another task."""
+    error = idempotency.mismatch(original, task_id)
+    if error:
+        return jsonify({"error": error}), 422
+    return _completion_response(original, replayed=True)
+
+
+def _completion_response(result, replayed=False):
+    response = jsonify({"message": "Task marked as completed", "photo_url": result["photo_url"]})
+    if replayed:
+        response.headers[idempotency.REPLAYED_HEADER] = "true"
+    return response, 201
+
+
+def _record_batch(items, user):
+    """
+    Validate, deduplicate and insert a batch; return (results, inserted rows).
+
+    Commits on success. Raises IntegrityError if a concurrent request recorded
+    one of the batch's idempotency keys first.
+    """
+    # Validate every item against the cached catalog before touching the database
+    catalog = task_catalog.snapshot()
+    now = datetime.utcnow()
+    keys = [
+        item["idempotency_key"] for item in items
+        if isinstance(item, dict) and isinstance(item.get("idempotency_key"), str)
+    ]
+    recorded = idempotency.lookup_many(user.user_id, keys) if keys else {}
+
+    results = []
+    rows = []
+    seen_keys = set()
+    points = 0
+    for index, item in enumerate(items):
+        error, row = _batch_completion_row(item, user.user_id, catalog, now)
+        if error:
+            results.append({"index": index, "status": "error", "error": error})
+            continue
+        key = row["idempotency_key"]
+        if key in recorded:
+            original = recorded[key]
+            error = idempotency.mismatch(original, row["task_id"])
+            if error:
+                results.append({"index": index, "status": "error", "error": error})
+            else:
+                results.append({
+                    "index": index, "status": "replayed",
+                    "user_task_id": original["user_task_id"], "photo_url": original["photo_url"],
+                })
+            continue
+        if key is not None and key in seen_keys:
+            results.append({"index": index, "status": "error", "error": "Duplicate idempotency_key in batch"})
+            continue
+        if key is not None:
+            seen_keys.add(key)
+        results.append({"index": index, "status": "completed", "photo_url": row["photo_url"]})
+        rows.append(row)
+        points += catalog.by_id[row["task_id"]]["points"]
+
+    if not rows:
+        return results, rows
+
+    # One multi-row INSERT for the whole batch. RETURNING order is not
+    # guaranteed to follow VALUES, so ids are matched back by the inserted
+    # values; rows identical in every column are interchangeable.
+    returned = db.session.execute(
+        insert(UserTasks).values(rows).returning(UserTasks.user_task_id, *_batch_match_columns())
+    ).all()
+    ids_by_values = {}
+    for user_task_id, *values in returned:
+        ids_by_values.setdefault(tuple(values), []).append(user_task_id)
+    inserted = [ids_by_values[_batch_match_values(row)].pop() for row in rows]
+    team_total = add_team_points(user.team_id, points)
+    add_user_points(user.user_id, points)
+    completions = [UserTasks(user_task_id=user_task_id, **row) for row, user_task_id in zip(rows, inserted)]
+    publish(_completion_events(user, completions, catalog.by_id, points, team_total))
+    record_completions(user.user_id, [row["task_id"] for row in rows])
+    db.session.commit()
+
+    ids = iter(inserted)
+    for result in results:
+        if result["status"] == "completed":
+            result["user_task_id"] = next(ids)
+    for row, user_task_id in zip(rows, inserted):
+        if row["idempotency_key"] is not None:
+            idempotency.recent_keys.put(user.user_id, row["idempotency_key"], {
+                "user_task_id": user_task_id, "task_id": row["task_id"], "photo_url": row["photo_url"]
+            })
+    return results, rows
+
+
+def _completion_events(user, completions, tasks_by_id, points, team_total):
+    """Feed events for newly recorded completions and the team score they moved."""
+    events = [
+        ("completion", _recent_task_dict(
+            completion, user.username,
+            tasks_by_id[completion.task_id]["task_name"], tasks_by_id[completion.task_id]["points"],
+        ))
+        for completion in completions
+    ]
+    if team_total is not None:
+        events.append(("team_points", {"team_id": user.team_id, "delta": points, "total_points": team_total}))
+    return events
+
+
+def _batch_match_columns():
+    return UserTasks.task_id, UserTasks.photo_url, UserTasks.completed_at, UserTasks.idempotency_key
+
+
+def _batch_match_values(row):
+    return row["task_id"], row["photo_url"], row["completed_at"], row["idempotency_key"]
+
+
+def _batch_completion_row(item, user_id, catalog, now):
+    """Validate one batch item; return (error, None) or (None, UserTasks row values)."""
+    if not isinstance(item, dict):
+        return "Item must be an object", None
+
+    task_id = item.get("task_id")
+    # JSON true/false are ints to isinstance, and True == 1
+    if type(task_id) is not int or task_id not in catalog.by_id:
+        return "Task not found", None
+
+    file_key = item.get("file_key")
+    if not file_key:
+        return "file_key is required", None
+    if not isinstance(file_key, str) or len(photo_url_for(file_key)) > PHOTO_URL_MAX_LENGTH:
+        return "file_key is too long", None
+
+    try:
+        key = idempotency.validate_key(item.get("idempotency_key"))
+    except idempotency.InvalidIdempotencyKey as e:
+        return str(e), None
+
+    completed_at = now
+    if item.get("completed_at"):
+        try:
+            completed_at = datetime.fromisoformat(item["completed_at"])
+        except (TypeError, ValueError):
+            return "completed_at must be an ISO 8601 timestamp", None
+        if completed_at.tzinfo is not None:
+            completed_at = completed_at.astimezone(timezone.utc).replace(tzinfo=None)
+        # Clock skew on the client must not place completions in the future
+        completed_at = min(completed_at, now)
+
+    return None, {
+        "user_id": user_id,
+        "task_id": task_id,
+        "photo_url": photo_url_for(file_key),
+        "completed_at": completed_at,
+        "idempotency_key": key,
+    }
+
+
+def open_tasks_for_user(user_id):
+    """Catalog tasks the user has not completed yet, in task_id order; no query when both caches are warm."""
+    return open_tasks(user_id, task_catalog.snapshot().tasks)
+
+
+def recent_completions_query():
+    # Query for the recent tasks, joining User and Task details
+    return (
+        db.session.query(UserTasks, User.username, Tasks.task_name, Tasks.points)
+        .join(User, UserTasks.user_id == User.user_id)
+        .join(Tasks, UserTasks.task_id == Tasks.task_id)
+    )
+
+
+def recent_completions(n):
+    """The n most recent completions across all users, newest first."""
+    rows = recent_completions_query() \
+        .order_by(UserTasks.completed_at.desc(), UserTasks.user_task_id.desc()) \
+        .limit(n) \
+        .all()
+    return [_recent_task_dict(*row) for row in rows]
+
+
+def _recent_task_dict(task, username, task_name, points):
+    return {
+        "user_task_id": task.user_task_id,
+        "user_id": task.user_id,
+        "task_id": task.task_id,
+        "task_name": task_name,
+        "points": points,
+        "username": username,
+        "photo_url": task.photo_url,
+        "photo_variants": task.photo_variants or {},
+        "completed_at": task.completed_at.strftime("%Y-%m-%d %H:%M:%S")
+    }
@@ -1,12 +1,14 @@
 # Get point totals for all teams
 from flask import Blueprint, jsonify
 from sqlalchemy import func
-from models import db, Teams, User, UserTasks, Tasks
+from metrics import query_budget
+from models import db, Teams, TeamPoints
 
 # Create a Blueprint for team routes
 team_routes = Blueprint("team_routes", __name__)
 
 @team_routes.route("/api/teams/points", methods=["GET"])
+@query_budget(1)
 def get_teams_with_points():
     """
     Get all teams with their total points.
@@ -23,6 +25,9 @@ def get_teams_with_points():
               items:
                 type: object
                 properties:
+                  team_id:
+                    type: integer
+                    description: ID of the team
                   team_name:
                     type: string
                     description: Name of the team
@@ -33,20 +38,18 @@ def get_teams_with_points():
         description: Error retrieving teams and points
     """
     try:
-        # Query to get total points for each team by summing points from UserTasks and Tasks
+        # Read the materialized totals; teams with no completions report zero
         results = db.session.query(
+            Teams.team_id,
             Teams.team_name,
-            func.coalesce(func.sum(Tasks.points), 0).label("total_points")
-        ).join(User, User.team_id == Teams.team_id) \
-         .join(UserTasks, User.user_id == UserTasks.user_id) \
-         .join(Tasks, Tasks.task_id == UserTasks.task_id) \
-         .group_by(Teams.team_name) \
+            func.coalesce(TeamPoints.total_points, 0).label("total_points")
+        ).outerjoin(TeamPoints, TeamPoints.team_id == Teams.team_id) \
          .all()
 
         # Format the result as a list of dictionaries
         teams_with_points = [
-            {"team_name": team_name, "total_points": total_points}
-            for team_name, total_points in results
+            {"team_id": team_id, "team_name": team_name, "total_points": total_points}
+            for team_id, team_name, total_points in results
         ]
 
         return jsonify(teams_with_points), 200
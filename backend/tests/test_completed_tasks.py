@@ -0,0 +1,89 @@
+import types
+import pytest
+from sqlalchemy.orm import Session
+import completed_tasks as module
+from completed_tasks import CompletedTaskCache, has_task, to_bitset
+
+
+class StubCache(CompletedTaskCache):
+    """Loads from a dict instead of the database; ``during_load`` runs mid-query."""
+
+    def __init__(self, stored, during_load=None):
+        super().__init__()
+        self.stored = stored
+        self.during_load = during_load
+        self.loads = 0
+
+    def _load(self, user_ids):
+        self.loads += 1
+        loaded = {user_id: to_bitset(self.stored.get(user_id, ())) for user_id in user_ids}
+        if self.during_load is not None:
+            during_load, self.during_load = self.during_load, None
+            during_load()
+        return loaded
+
+
+def test_add_during_fill_is_merged_into_its_result():
+    # The fill's query ran before task 5 committed, so only the merge can add it
+    cache = StubCache({1: [3]}, during_load=lambda: cache.add(1, [5]))
+    bits = cache.get(1)
+    assert has_task(bits, 3) and has_task(bits, 5)
+    assert cache.get(1) == bits
+    assert cache.loads == 1
+
+
+def test_late_adds_survive_until_the_last_fill_finishes():
+    def overlapping_fill():
+        cache.add(1, [5])
+        # A second fill finishing first must not drop the first fill's late bits
+        cache.get(2)
+
+    cache = StubCache({1: [3], 2: [4]}, during_load=overlapping_fill)
+    assert has_task(cache.get(1), 5)
+    assert not cache._late
+
+
+def test_add_for_uncached_user_without_fill_is_dropped():
+    cache = StubCache({1: [3]})
+    cache.add(1, [5])
+    assert cache.get(1) == to_bitset([3])
+
+
+def test_completion_event_sets_bit_and_resync_clears():
+    cache = StubCache({1: [3]})
+    cache.get(1)
+    cache.on_event("completion", {"user_id": 1, "task_id": 7})
+    assert has_task(cache.get(1), 7)
+    assert cache.loads == 1
+
+    cache.on_event("resync", {})
+    assert cache.get(1) == to_bitset([3])
+    assert cache.loads == 2
+
+
+@pytest.fixture
+def session(monkeypatch):
+    cache = StubCache({1: [3]})
+    cache.get(1)
+    session = Session()
+    monkeypatch.setattr(module, "completed_tasks", cache)
+    monkeypatch.setattr(module, "db", types.SimpleNamespace(session=session))
+    yield session
+    session.close()
+
+
+def test_commit_applies_pending_bits(session):
+    session.begin()
+    module.record_completions(1, [8])
+    assert not has_task(module.completed_tasks.get(1), 8)
+    session.commit()
+    assert has_task(module.completed_tasks.get(1), 8)
+
+
+def test_rollback_discards_pending_bits(session):
+    session.begin()
+    module.record_completions(1, [8])
+    session.rollback()
+    session.begin()
+    session.commit()
+    assert not has_task(module.completed_tasks.get(1), 8)
@@ -0,0 +1,147 @@
+import threading
+import time
+import pytest
+from geocode import geohash, GeocoderUnavailable, OPEN_WATER, PolygonIndex, ReverseGeocoder
+
+PARIS = {"city": "Paris", "state": "Ile-de-France", "country": "France"}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Source:
+    """Upstream stand-in that counts calls and can be made to block or fail."""
+
+    def __init__(self, place=PARIS, error=None):
+        self.place = place
+        self.error = error
+        self.calls = 0
+        self.release = None
+
+    def __call__(self, lat, lng):
+        self.calls += 1
+        if self.release is not None:
+            self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.place
+
+
+def _square(x0, y0, x1, y1, z=None):
+    ring = [[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]
+    return [point + [z] for point in ring] if z is not None else ring
+
+
+def _feature(name, rings, kind="Admin-0 country"):
+    return {"properties": {"name": name, "featurecla": kind},
+            "geometry": {"type": "Polygon", "coordinates": rings}}
+
+
+def test_geohash_known_values():
+    assert geohash(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert geohash(42.6, -5.6, 5) == "ezs42"
+    # Shorter hashes are prefixes of longer ones
+    assert geohash(48.85, 2.35, 7).startswith(geohash(48.85, 2.35, 3))
+
+
+def test_polygon_lookup_honours_holes_and_altitude():
+    pytest.importorskip("numpy")
+    index = PolygonIndex([
+        _feature("Squareland", [_square(0, 0, 10, 10, z=120.0), _square(4, 4, 6, 6, z=0.0)]),
+        _feature("Square Sea", [_square(20, 0, 30, 10)], kind="sea"),
+    ])
+    assert index.lookup(2, 2) == ("Squareland", False)
+    assert index.lookup(5, 5) is None
+    assert index.lookup(5, 25) == ("Square Sea", True)
+    assert index.lookup(5, 15) is None
+
+
+def test_water_in_index_never_reaches_upstream():
+    pytest.importorskip("numpy")
+    source = Source()
+    geocoder = ReverseGeocoder(source, PolygonIndex([_feature("Square Sea", [_square(20, 0, 30, 10)], "sea")]))
+    place, where = geocoder.reverse(5, 25)
+    assert (place["country"], where) == ("Square Sea", "index")
+    assert source.calls == 0
+
+
+def test_cell_is_cached_until_ttl():
+    clock = FakeClock()
+    source = Source()
+    geocoder = ReverseGeocoder(source, ttl=60, min_interval=0, clock=clock)
+    assert geocoder.reverse(48.85, 2.35) == (PARIS, "upstream")
+    assert geocoder.reverse(48.8501, 2.3501) == (PARIS, "cache")
+    clock.now += 61
+    assert geocoder.reverse(48.85, 2.35) == (PARIS, "upstream")
+    assert source.calls == 2
+
+
+def test_concurrent_misses_share_one_upstream_call():
+    source = Source()
+    source.release = threading.Event()
+    geocoder = ReverseGeocoder(source, min_interval=0)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(geocoder.reverse(48.85, 2.35))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    source.release.set()
+    for thread in threads:
+        thread.join()
+    assert source.calls == 1
+    assert sorted(where for _, where in results) == ["cache"] * 7 + ["upstream"]
+
+
+def test_rate_limited_lookup_waits_for_the_next_slot():
+    source = Source()
+    geocoder = ReverseGeocoder(source, min_interval=0.2)
+    geocoder.reverse(48.85, 2.35)
+    started = time.monotonic()
+    assert geocoder.reverse(51.5, -0.1) == (PARIS, "upstream")
+    assert time.monotonic() - started >= 0.15
+
+
+def test_rate_limit_beyond_max_wait_is_unavailable():
+    geocoder = ReverseGeocoder(Source(), min_interval=60, max_wait=0.1)
+    geocoder.reverse(48.85, 2.35)
+    with pytest.raises(GeocoderUnavailable):
+        geocoder.reverse(51.5, -0.1)
+
+
+def test_failure_falls_back_to_index_country():
+    pytest.importorskip("numpy")
+    index = PolygonIndex([_feature("Squareland", [_square(0, 0, 10, 10)])])
+    geocoder = ReverseGeocoder(Source(error=OSError("down")), index, min_interval=0)
+    place, where = geocoder.reverse(2, 2)
+    assert (place["country"], where) == ("Squareland", "index")
+    with pytest.raises(GeocoderUnavailable):
+        geocoder.reverse(50, 50)
+
+
+def test_open_water_is_cached_for_the_coarse_cell():
+    source = Source(place=OPEN_WATER)
+    geocoder = ReverseGeocoder(source, precision=5, water_precision=3, min_interval=0)
+    geocoder.reverse(-30.0, -120.0)
+    # A different fine cell inside the same coarse cell
+    assert geohash(-30.0, -120.3, 5) != geohash(-30.0, -120.0, 5)
+    assert geocoder.reverse(-30.0, -120.3) == (OPEN_WATER, "cache")
+    assert source.calls == 1
+
+
+def test_land_answer_evicts_coarse_water_cell():
+    pytest.importorskip("numpy")
+    island = PolygonIndex([_feature("Island", [_square(-121, -31, -120.8, -30.8)])])
+    source = Source(place=OPEN_WATER)
+    geocoder = ReverseGeocoder(source, island, precision=5, water_precision=3, min_interval=0)
+    geocoder.reverse(-30.0, -120.0)
+
+    # The index puts this point on land, so it skips the open-water entry
+    source.place = PARIS
+    assert geocoder.reverse(-30.9, -120.9) == (PARIS, "upstream")
+    source.place = OPEN_WATER
+    assert geocoder.reverse(-30.5, -120.6)[1] == "upstream"
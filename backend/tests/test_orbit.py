@@ -0,0 +1,29 @@
+import random
+import pytest
+
+pytest.importorskip("sgp4")
+
+from orbit import tle_store, predict_passes  # noqa: E402
+
+
+def _nearest(passes, culminate):
+    return min(passes, key=lambda p: abs(p["culminate"] - culminate))
+
+
+def test_peak_matches_dense_sampling():
+    tle = tle_store.current()
+    rng = random.Random(7)
+    lats = [rng.uniform(-55, 55) for _ in range(200)]
+    lngs = [rng.uniform(-180, 180) for _ in range(200)]
+    coarse = predict_passes(tle, lats, lngs, tle.epoch, 2)
+    dense = predict_passes(tle, lats, lngs, tle.epoch, 2, step=1)
+
+    compared = 0
+    for site_coarse, site_dense in zip(coarse, dense):
+        for p in site_coarse:
+            q = _nearest(site_dense, p["culminate"])
+            assert abs(q["culminate"] - p["culminate"]) < 1
+            # Both are rounded to 0.1 degree
+            assert abs(q["max_elevation"] - p["max_elevation"]) < 0.25
+            compared += 1
+    assert compared
@@ -0,0 +1,14 @@
+import pytest
+from passwords import PasswordHasher
+
+
+@pytest.mark.parametrize("method", ["scrypt", "scrypt:16384:8:1", "pbkdf2:sha256", "pbkdf2:sha256:1000"])
+def test_fresh_hash_does_not_need_rehash(method):
+    hasher = PasswordHasher(method=method, workers=1)
+    assert not hasher.needs_rehash(hasher.hash("correct horse"))
+
+
+def test_other_cost_needs_rehash():
+    old = PasswordHasher(method="pbkdf2:sha256:1000", workers=1)
+    new = PasswordHasher(method="pbkdf2:sha256:2000", workers=1)
+    assert new.needs_rehash(old.hash("correct horse"))
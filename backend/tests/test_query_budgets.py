@@ -0,0 +1,112 @@
+"""
+Drive every @query_budget route against a seeded Postgres database and fail
+when one runs more SQL than it declares.
+
+Set TEST_DB_NAME to a scratch database on the DB_HOST server (with the usual
+DB_* variables); it is dropped and reseeded by initdb.py and gen_data.py.
+Without it only the coverage check runs.
+"""
+import os
+import subprocess
+import sys
+import uuid
+import pytest
+
+TEST_DB_NAME = os.getenv("TEST_DB_NAME")
+if TEST_DB_NAME:
+    # app.py reads the database settings at import time
+    os.environ["DB_NAME"] = TEST_DB_NAME
+
+import metrics
+from app import app
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED_ARGS = ["--users", "500", "--teams", "10", "--completions", "5000", "--days", "7"]
+
+
+def _unique():
+    return uuid.uuid4().hex[:12]
+
+
+# Endpoint -> (method, path, body factory, whether it must succeed). Routes that
+# only call S3 or upstream services may fail offline; their budget is still checked.
+CASES = {
+    "task_routes.get_tasks_not_completed_by_user": ("GET", "/api/tasks/not-completed", None, True),
+    "task_routes.get_all_asks": ("GET", "/api/tasks", None, True),
+    "task_routes.get_task_by_id": ("GET", "/api/tasks/{task_id}", None, True),
+    "task_routes.generate_presigned_url": ("POST", "/api/generate-presigned-url",
+                                           lambda values: {"file_name": "photo.jpg"}, False),
+    "task_routes.generate_presigned_urls": ("POST", "/api/generate-presigned-urls",
+                                            lambda values: {"file_names": ["a.jpg", "b.jpg"]}, False),
+    "task_routes.complete_task": ("POST", "/api/tasks/{task_id}/complete",
+                                  lambda values: {"file_key": f"test/{_unique()}.jpg"}, True),
+    "task_routes.complete_tasks_batch": ("POST", "/api/tasks/complete-batch", lambda values: {"completions": [
+        {"task_id": values["task_id"], "file_key": f"test/{_unique()}.jpg", "idempotency_key": _unique()}
+        for _ in range(10)
+    ]}, True),
+    "task_routes.get_recent_user_tasks": ("GET", "/api/user-tasks/recent/20", None, True),
+    "team_routes.get_teams_with_points": ("GET", "/api/teams/points", None, True),
+    "user_routes.get_user_by_id": ("GET", "/api/users/{user_id}", None, True),
+    "user_routes.get_users": ("GET", "/api/users", None, True),
+    "user_routes.get_user_by_team": ("GET", "/api/users/team/{team_id}", None, True),
+    "user_routes.get_user_leaderboard": ("GET", "/api/users/leaderboard?around_me=5", None, True),
+    "dashboard_routes.get_dashboard": ("GET", "/api/dashboard", None, True),
+    "iss_routes.get_iss_position": ("GET", "/api/iss/position", None, False),
+    "iss_routes.get_iss_passes": ("GET", "/api/iss/passes?lat=51.5&lng=-0.1", None, False),
+    "iss_routes.get_iss_ground_track": ("GET", "/api/iss/ground-track", None, False),
+    "geocode_routes.reverse_geocode": ("GET", "/api/geocode/reverse?lat=48.85&lng=2.35", None, False),
+}
+
+
+def budgeted_endpoints():
+    return sorted(endpoint for endpoint, view in app.view_functions.items() if hasattr(view, "query_budget"))
+
+
+def test_every_budgeted_route_has_a_case():
+    assert budgeted_endpoints() == sorted(CASES)
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    if not TEST_DB_NAME:
+        pytest.skip("TEST_DB_NAME is not set")
+    for script, args in (("initdb.py", []), ("gen_data.py", SEED_ARGS)):
+        subprocess.run([sys.executable, script, *args], cwd=BACKEND, check=True)
+
+    from flask_jwt_extended import create_access_token
+    from identity import identity_claims
+    from models import db, User, Tasks
+
+    with app.app_context():
+        # The busiest user, so list and leaderboard routes have rows to fetch
+        user = User.query.join(User.tasks).group_by(User.user_id) \
+            .order_by(db.func.count().desc(), User.user_id).first()
+        task = Tasks.query.order_by(Tasks.task_id).first()
+        token = create_access_token(identity=user.email, additional_claims=identity_claims(user))
+        values = {"user_id": user.user_id, "team_id": user.team_id, "task_id": task.task_id}
+    yield app.test_client(), {"Authorization": f"Bearer {token}"}, values
+
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def strict(monkeypatch):
+    monkeypatch.setattr(metrics, "QUERY_BUDGET_STRICT", True)
+
+
+@pytest.mark.parametrize("endpoint", sorted(CASES))
+def test_route_stays_within_budget(seeded, strict, endpoint):
+    client, headers, values = seeded
+    method, path, body, must_succeed = CASES[endpoint]
+    before = sum(metrics.metrics.budget_exceeded.values())
+
+    response = client.open(path.format(**values), method=method, headers=headers,
+                           json=body(values) if body else None)
+    # Streamed bodies run their queries while being read
+    response.get_data()
+
+    # Handlers that turn exceptions into 500s swallow QueryBudgetExceeded; the counter does not
+    assert sum(metrics.metrics.budget_exceeded.values()) == before, f"{endpoint} went over its query budget"
+    if must_succeed:
+        assert response.status_code < 400, response.get_data(as_text=True)
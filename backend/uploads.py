@@ -0,0 +1,91 @@
+# Pre-signed S3 upload targets for completion photos
+import os
+import threading
+import uuid
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Created on first use: importing boto3 and building a client is a large
+# share of worker boot time, and many processes never sign an upload
+s3_client = None
+_s3_client_lock = threading.Lock()
+S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME", "astronaut-app-images-bucket")
+
+ALLOWED_EXTENSIONS = {"jpeg", "jpg", "png"}
+UPLOAD_EXPIRES_SECONDS = 3600  # URLs and policies are valid for 1 hour
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 10 * 1024 * 1024))
+MAX_BATCH_UPLOADS = 50
+
+
+class InvalidUpload(ValueError):
+    """Raised when a requested upload cannot be signed."""
+
+
+def get_s3_client():
+    global s3_client
+    if s3_client is None:
+        with _s3_client_lock:
+            if s3_client is None:
+                import boto3
+
+                s3_client = boto3.client(
+                    "s3",
+                    region_name=os.getenv("AWS_REGION"),
+                    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
+                )
+    return s3_client
+
+
+def content_type_for(file_name):
+    if not isinstance(file_name, str) or "." not in file_name:
+        raise InvalidUpload("Invalid file type. Only jpeg, jpg, or png allowed.")
+    file_extension = file_name.rsplit(".", 1)[-1].lower()  # Get the extension
+    if file_extension not in ALLOWED_EXTENSIONS:
+        raise InvalidUpload("Invalid file type. Only jpeg, jpg, or png allowed.")
+    return f"image/{'jpeg' if file_extension in ['jpeg', 'jpg'] else 'png'}"
+
+
+def sign_upload(file_name, method="put", client=None, bucket=None):
+    """
+    Sign one upload and return the dict sent back to the client.
+
+    ``put`` returns a pre-signed PUT URL. ``post`` returns a pre-signed POST
+    policy in which S3 itself enforces the content type and a
+    content-length range of 1..MAX_UPLOAD_BYTES.
+    Signing is local HMAC work; no request is made to S3.
+    """
+    client = client or get_s3_client()
+    bucket = bucket or S3_BUCKET_NAME
+    content_type = content_type_for(file_name)
+
+    # Generate a unique file key for S3
+    file_key = f"{uuid.uuid4().hex}_{file_name}"
+
+    if method == "put":
+        url = client.generate_presigned_url(
+            "put_object",
+            Params={
+                "Bucket": bucket,
+                "Key": file_key,
+                "ContentType": content_type  # Use the determined content type
+            },
+            ExpiresIn=UPLOAD_EXPIRES_SECONDS
+        )
+        return {"url": url, "file_key": file_key}
+
+    if method == "post":
+        policy = client.generate_presigned_post(
+            Bucket=bucket,
+            Key=file_key,
+            Fields={"Content-Type": content_type},
+            Conditions=[
+                {"Content-Type": content_type},
+                ["content-length-range", 1, MAX_UPLOAD_BYTES],
+            ],
+            ExpiresIn=UPLOAD_EXPIRES_SECONDS
+        )
+        return {"url": policy["url"], "fields": policy["fields"], "file_key": file_key}
+
+    raise InvalidUpload("method must be 'put' or 'post'")
@@ -1,17 +1,22 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-import boto3
-import os
-import uuid
-from datetime import datetime
+from flask_jwt_extended import jwt_required
+from identity import current_identity
+from metrics import query_budget
 from models import db, User, Tasks, UserTasks
+from scores import top_users, users_around
+from pagination import paginate, page_size, CursorError
+from streaming import wants_stream, stream_json
 
 # Create a Blueprint for task routes
 user_routes = Blueprint("user_routes", __name__)
 
+LEADERBOARD_MAX_LIMIT = 100
+LEADERBOARD_MAX_AROUND = 25
+
 # Get user by id
 @user_routes.route("/api/users/<int:user_id>", methods=["GET"])
 @jwt_required()
+@query_budget(1)
 def get_user_by_id(user_id):
     """
     Get a user by ID.
@@ -58,12 +63,33 @@ def get_user_by_id(user_id):
 
 @user_routes.route("/api/users", methods=["GET"])
 @jwt_required()
+@query_budget(1)
 def get_users():
     """
-    Get all users.
+    Get all users, one page at a time.
     ---
     tags:
       - Users
+    parameters:
+      - name: cursor
+        in: query
+        required: false
+        schema:
+          type: string
+        description: Opaque cursor returned by the previous page
+      - name: limit
+        in: query
+        required: false
+        schema:
+          type: integer
+          default: 50
+        description: Page size (max 200)
+      - name: stream
+        in: query
+        required: false
+        schema:
+          type: boolean
+        description: Stream every row in constant memory instead of returning one page
     responses:
       200:
         description: Users retrieved successfully
@@ -89,17 +115,29 @@ def get_users():
                       created_at:
                         type: string
                         description: Date and time the user was created
+                next_cursor:
+                  type: string
+                  description: Cursor for the next page, null on the last page
+      400:
+        description: Malformed cursor
       500:
         description: Error retrieving users
     """
-    users = User.query.all()
-    return jsonify({"users": [user.to_dict() for user in users]}), 200
+    if wants_stream():
+        return stream_json(User.query.order_by(User.user_id), User.to_dict, key="users")
+
+    try:
+        users, next_cursor = paginate(User.query, [User.user_id], (int,), page_size())
+    except CursorError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"users": [user.to_dict() for user in users], "next_cursor": next_cursor}), 200
 
 @user_routes.route("/api/users/team/<int:team_id>", methods=["GET"])
 @jwt_required()
+@query_budget(1)
 def get_user_by_team(team_id):
     """
-    Get all users by team id.
+    Get all users by team id, one page at a time.
     ---
     tags:
       - Users
@@ -110,6 +148,19 @@ def get_user_by_team(team_id):
         required: true
         schema:
           type: integer
+      - name: cursor
+        in: query
+        required: false
+        schema:
+          type: string
+        description: Opaque cursor returned by the previous page
+      - name: limit
+        in: query
+        required: false
+        schema:
+          type: integer
+          default: 50
+        description: Page size (max 200)
     responses:
       200:
         description: Users retrieved successfully
@@ -135,12 +186,109 @@ def get_user_by_team(team_id):
                       created_at:
                         type: string
                         description: Date and time the user was created
+                next_cursor:
+                  type: string
+                  description: Cursor for the next page, null on the last page
+      400:
+        description: Malformed cursor
       404:
         description: Users not found
       500:
         description: Error retrieving users
     """
-    users = User.query.filter_by(team_id=team_id).all()
-    if not users:
+    try:
+        users, next_cursor = paginate(
+            User.query.filter_by(team_id=team_id), [User.user_id], (int,), page_size()
+        )
+    except CursorError as e:
+        return jsonify({"error": str(e)}), 400
+    if not users and not request.args.get("cursor"):
         return jsonify({"error": "Users not found"}), 404
-    return jsonify({"users": [user.to_dict() for user in users]}), 200
+    return jsonify({"users": [user.to_dict() for user in users], "next_cursor": next_cursor}), 200
+
+
+@user_routes.route("/api/users/leaderboard", methods=["GET"])
+@jwt_required()
+@query_budget(8)
+def get_user_leaderboard():
+    """
+    Get the individual leaderboard and the caller's rank.
+    ---
+    tags:
+      - Users
+    parameters:
+      - name: limit
+        in: query
+        required: false
+        schema:
+          type: integer
+          default: 10
+        description: Number of top users to return (max 100)
+      - name: around_me
+        in: query
+        required: false
+        schema:
+          type: integer
+          default: 0
+        description: Number of neighbours to return on each side of the caller (max 25)
+    responses:
+      200:
+        description: Leaderboard retrieved successfully
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                top:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      rank:
+                        type: integer
+                        description: Competition rank, shared by tied users
+                      user_id:
+                        type: integer
+                        description: ID of the user
+                      username:
+                        type: string
+                        description: Username of the user
+                      team_id:
+                        type: integer
+                        description: ID of the user's team
+                      total_points:
+                        type: integer
+                        description: Total points earned by the user
+                me:
+                  type: object
+                  description: The caller's own leaderboard entry
+                around_me:
+                  type: array
+                  description: The caller and their neighbours, in rank order
+      400:
+        description: Invalid limit or around_me
+      404:
+        description: User not found
+      500:
+        description: Error retrieving leaderboard
+    """
+    limit = request.args.get("limit", 10, type=int)
+    around = request.args.get("around_me", 0, type=int)
+    if limit < 0 or around < 0:
+        return jsonify({"error": "limit and around_me must be non-negative integers"}), 400
+    limit = min(limit, LEADERBOARD_MAX_LIMIT)
+    around = min(around, LEADERBOARD_MAX_AROUND)
+
+    user = current_identity()
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+
+    try:
+        me, neighbours = users_around(user.user_id, around)
+        return jsonify({
+            "top": top_users(limit),
+            "me": me,
+            "around_me": neighbours,
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -56,11 +56,15 @@ const TaskCard = ({ task, onClick, isCompleted }) => (
           {new Date(task.completed_at).toLocaleString()}
         </p>
         {task.photo_url && (
-          <img 
-            src={task.photo_url} 
-            alt="Mission complete" 
-            className="object-cover w-full mt-2 transition-transform duration-300 border rounded-lg border-slate-600 hover:scale-105"
-          />
+          <picture>
+            {task.photo_variants?.thumb && <source srcSet={task.photo_variants.thumb} type="image/webp" />}
+            <img 
+              src={task.photo_variants?.thumb_jpeg || task.photo_url} 
+              alt="Mission complete" 
+              loading="lazy"
+              className="object-cover w-full mt-2 transition-transform duration-300 border rounded-lg border-slate-600 hover:scale-105"
+            />
+          </picture>
         )}
       </>
     ) : (
@@ -84,32 +88,20 @@ export default function Dashboard() {
   useEffect(() => {
     const loadData = async () => {
       try {
-        const [userResponse, recentResponse, notCompletedResponse] = await Promise.all([
-          fetch('http://localhost:5000/api/protected', {
-            headers: { 'Authorization': `Bearer ${getToken()}` }
-          }),
-          fetch('http://localhost:5000/api/user-tasks/recent/5', {
-            headers: { 'Authorization': `Bearer ${getToken()}` }
-          }),
-          fetch('http://localhost:5000/api/tasks/not-completed', {
-            headers: { 'Authorization': `Bearer ${getToken()}` }
-          })
-        ]);
+        const dashboardResponse = await fetch('http://localhost:5000/api/dashboard', {
+          headers: { 'Authorization': `Bearer ${getToken()}` }
+        });
 
-        if (!userResponse.ok) {
+        if (!dashboardResponse.ok) {
           handleLogout();
           return;
         }
 
-        const [userData, recentData, notCompletedData] = await Promise.all([
-          userResponse.json(),
-          recentResponse.json(),
-          notCompletedResponse.json()
-        ]);
+        const { profile, recent_tasks, not_completed_tasks } = await dashboardResponse.json();
 
-        setUserData(userData);
-        setRecentTasks(recentData);
-        setNotCompletedTasks(notCompletedData);
+        setUserData(profile);
+        setRecentTasks(recent_tasks);
+        setNotCompletedTasks(not_completed_tasks);
         
         // Add slight delay for loading animation
         setTimeout(() => setIsLoading(false), 1500);
@@ -120,6 +112,24 @@ export default function Dashboard() {
     };
 
     loadData();
+
+    // Prepend new completions as they happen instead of refetching
+    const events = new EventSource(`http://localhost:5000/api/events?jwt=${getToken()}`);
+    events.addEventListener('completion', (e) => {
+      const completion = JSON.parse(e.data);
+      setRecentTasks(tasks => tasks.some(task => task.user_task_id === completion.user_task_id)
+        ? tasks
+        : [completion, ...tasks].slice(0, Math.max(tasks.length, 5)));
+    });
+    // Swap in thumbnails once the photo worker has rendered them
+    events.addEventListener('photo_variants', (e) => {
+      const { user_task_id, photo_variants } = JSON.parse(e.data);
+      setRecentTasks(tasks => tasks.map(task => task.user_task_id === user_task_id
+        ? { ...task, photo_variants }
+        : task));
+    });
+    events.addEventListener('resync', loadData);
+    return () => events.close();
   }, []);
 
   const handleLogout = () => {
@@ -181,17 +191,12 @@ export default function Dashboard() {
       setMessage("Task completed successfully!");
       
       // Refresh data after completion
-      const [recentData, notCompletedData] = await Promise.all([
-        fetch('http://localhost:5000/api/user-tasks/recent/5', {
-          headers: { 'Authorization': `Bearer ${getToken()}` }
-        }).then(res => res.json()),
-        fetch('http://localhost:5000/api/tasks/not-completed', {
-          headers: { 'Authorization': `Bearer ${getToken()}` }
-        }).then(res => res.json())
-      ]);
+      const { recent_tasks, not_completed_tasks } = await fetch('http://localhost:5000/api/dashboard', {
+        headers: { 'Authorization': `Bearer ${getToken()}` }
+      }).then(res => res.json());
 
-      setRecentTasks(recentData);
-      setNotCompletedTasks(notCompletedData);
+      setRecentTasks(recent_tasks);
+      setNotCompletedTasks(not_completed_tasks);
       closeModal();
     } catch (error) {
       console.error("Error completing task:", error);
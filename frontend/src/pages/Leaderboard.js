@@ -53,6 +53,17 @@ export default function Leaderboard() {
 
   useEffect(() => {
     fetchTeamScores();
+
+    // Live score updates instead of polling
+    const events = new EventSource(`http://localhost:5000/api/events?jwt=${getToken()}`);
+    events.addEventListener('team_points', (e) => {
+      const { team_id, total_points } = JSON.parse(e.data);
+      setTeamScores(scores => scores
+        .map(team => team.team_id === team_id ? { ...team, total_points } : team)
+        .sort((a, b) => b.total_points - a.total_points));
+    });
+    events.addEventListener('resync', fetchTeamScores);
+    return () => events.close();
   }, []);
 
   if (loading) return <LoadingAnimation />;
@@ -89,7 +100,7 @@ export default function Leaderboard() {
           <div className="p-6 space-y-6">
             {teamScores.map((team, index) => (
               <div 
-                key={index}
+                key={team.team_id}
                 className="relative group"
               >
                 <div className="flex items-center mb-2">
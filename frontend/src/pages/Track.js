@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { MapContainer, TileLayer, Marker, Popup, useMap } from 'react-leaflet';
+import { MapContainer, TileLayer, Marker, Popup, Polyline, useMap } from 'react-leaflet';
 import 'leaflet/dist/leaflet.css';
 import L from 'leaflet';
 
@@ -18,6 +18,26 @@ const issIcon = new L.Icon({
   popupAnchor: [0, -16],
 });
 
+// Decode a Google encoded polyline into [lat, lng] pairs
+function decodePolyline(encoded) {
+  const points = [];
+  let index = 0, lat = 0, lng = 0;
+  while (index < encoded.length) {
+    for (const axis of [0, 1]) {
+      let result = 0, shift = 0, byte;
+      do {
+        byte = encoded.charCodeAt(index++) - 63;
+        result |= (byte & 0x1f) << shift;
+        shift += 5;
+      } while (byte >= 0x20);
+      const delta = result & 1 ? ~(result >> 1) : result >> 1;
+      if (axis === 0) lat += delta; else lng += delta;
+    }
+    points.push([lat / 1e5, lng / 1e5]);
+  }
+  return points;
+}
+
 function MapEvents({ onMapClick }) {
   const map = useMap();
   
@@ -39,16 +59,29 @@ export default function Track() {
   const [selectedLocation, setSelectedLocation] = useState(null);
   const [locationInfo, setLocationInfo] = useState(null);
   const [loadingLocation, setLoadingLocation] = useState(false);
+  const [groundTrack, setGroundTrack] = useState([]);
+
+  // Past and upcoming orbits, precomputed on the server and split at the antimeridian
+  const fetchGroundTrack = async () => {
+    try {
+      const response = await fetch('http://localhost:5000/api/iss/ground-track?before=1&after=1');
+      if (!response.ok) return;
+      const data = await response.json();
+      setGroundTrack(data.orbits.flatMap(orbit => orbit.segments.map(decodePolyline)));
+    } catch (err) {
+      console.error('Error fetching ground track:', err);
+    }
+  };
 
   const fetchISSPosition = async () => {
     try {
-      const response = await fetch('http://api.open-notify.org/iss-now.json');
+      const response = await fetch('http://localhost:5000/api/iss/position');
       if (!response.ok) throw new Error('Failed to fetch ISS position');
       
       const data = await response.json();
       const newPosition = {
-        latitude: parseFloat(data.iss_position.latitude),
-        longitude: parseFloat(data.iss_position.longitude)
+        latitude: data.latitude,
+        longitude: data.longitude
       };
       setIssPosition(newPosition);
       setLastUpdate(new Date(data.timestamp * 1000));
@@ -67,15 +100,15 @@ export default function Track() {
     setLoadingLocation(true);
     try {
       const response = await fetch(
-        `https://nominatim.openstreetmap.org/reverse?lat=${lat}&lon=${lng}&format=json&zoom=10`
+        `http://localhost:5000/api/geocode/reverse?lat=${lat}&lng=${lng}`
       );
       if (!response.ok) throw new Error('Failed to fetch location information');
       
       const data = await response.json();
       const locationData = {
-        city: data.address.city || data.address.town || data.address.county || 'Over Ocean',
-        state: data.address.state || data.address.region || '',
-        country: data.address.country || 'International Waters',
+        city: data.city,
+        state: data.state,
+        country: data.country,
         description: isISS ? 'ISS is currently over' : 'Selected location'
       };
       
@@ -102,8 +135,14 @@ export default function Track() {
 
   useEffect(() => {
     fetchISSPosition();
+    fetchGroundTrack();
     const interval = setInterval(fetchISSPosition, 5000);
-    return () => clearInterval(interval);
+    // The track window moves on once per orbit
+    const trackInterval = setInterval(fetchGroundTrack, 10 * 60 * 1000);
+    return () => {
+      clearInterval(interval);
+      clearInterval(trackInterval);
+    };
   }, []);
 
   const formatCoordinate = (coord, type) => {
@@ -171,6 +210,10 @@ export default function Track() {
                     url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
                   />
                   <MapEvents onMapClick={handleMapClick} />
+
+                  {groundTrack.map((segment, i) => (
+                    <Polyline key={i} positions={segment} pathOptions={{ color: '#60a5fa', weight: 2, opacity: 0.6 }} />
+                  ))}
                   
                   {issPosition && (
                     <Marker